@@ -0,0 +1,116 @@
+"""Compare memory and build time of chunk records against the pre-slots layout.
+
+The legacy layout mints a uuid4 id for every chunk up front; the current
+one leaves ``id`` unset until it is first read, as ingestion never reads it.
+
+Usage: python scripts/bench_chunk_memory.py [chunks]
+"""
+
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import uuid4
+
+from maomao.chunkers import Chunk, ChunkLocation, MetadataOverlay
+from maomao.chunkers.base import freeze_metadata
+
+
+@dataclass
+class LegacyLocation:
+    start_line: int = 0
+    end_line: int = 0
+    char_start: int = 0
+    char_end: int = 0
+
+
+@dataclass
+class LegacyChunk:
+    id: str = field(default_factory=lambda: str(uuid4()))
+    content: str = ""
+    metadata: dict[str, Any] = field(default_factory=dict)
+    content_hash: str = ""
+    location: LegacyLocation | None = None
+
+
+ITEM_METADATA = {
+    "title": "Deployment guide",
+    "tags": ["ops", "k8s"],
+    "author": "maomao",
+    "date": "2024-05-01",
+    "filename": "deploy.md",
+    "extension": ".md",
+    "base_path": "/home/dev/projects/maomao/docs",
+}
+CHUNKS_PER_ITEM = 20
+CONTENT = "chunk text " * 40
+
+
+def build_legacy(count: int) -> list[LegacyChunk]:
+    chunks = []
+    metadata = dict(ITEM_METADATA)
+    for i in range(count):
+        if i % CHUNKS_PER_ITEM == 0:
+            metadata = dict(ITEM_METADATA)
+        chunks.append(LegacyChunk(
+            content=CONTENT,
+            content_hash=f"{i:016x}",
+            location=LegacyLocation(i, i + 3, i * 100, i * 100 + 90),
+            metadata={**metadata, "chunk_index": i % CHUNKS_PER_ITEM, "chunk_size": 440},
+        ))
+    return chunks
+
+
+def build_current(count: int) -> list[Chunk]:
+    chunks = []
+    base = freeze_metadata(ITEM_METADATA)
+    for i in range(count):
+        if i % CHUNKS_PER_ITEM == 0:
+            base = freeze_metadata(dict(ITEM_METADATA))
+        chunks.append(Chunk(
+            content=CONTENT,
+            content_hash=f"{i:016x}",
+            location=ChunkLocation(i, i + 3, i * 100, i * 100 + 90),
+            metadata=MetadataOverlay(base, {"chunk_index": i % CHUNKS_PER_ITEM, "chunk_size": 440}),
+        ))
+    return chunks
+
+
+def measure(build, count: int) -> int:
+    tracemalloc.start()
+    chunks = build(count)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del chunks
+    return used
+
+
+def build_time(build, count: int) -> float:
+    started = time.perf_counter()
+    build(count)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    legacy = measure(build_legacy, count)
+    current = measure(build_current, count)
+    legacy_time = build_time(build_legacy, count)
+    current_time = build_time(build_current, count)
+    scale = 1_000_000 / count
+    print(f"chunks:  {count}")
+    for name, used, elapsed in [
+        ("legacy", legacy, legacy_time),
+        ("current", current, current_time),
+    ]:
+        print(
+            f"{name + ':':8} {used / count:7.1f} B/chunk  "
+            f"{used * scale / 2**20:8.1f} MiB per million  "
+            f"{elapsed / count * 1e9:6.0f} ns/chunk"
+        )
+    print(f"saved:   {1 - current / legacy:7.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compare embedding response decoding across codecs.
+
+Usage: python scripts/bench_embedding_decode.py [texts] [dim]
+"""
+
+import json
+import random
+import sys
+import timeit
+from functools import partial
+
+import numpy as np
+
+from maomao.embeddings import HAS_ORJSON, JsonCodec, OrjsonCodec
+
+
+def make_body(count: int, dim: int) -> bytes:
+    rng = random.Random(0)
+    payload = {
+        "model": "bge-m3",
+        "embeddings": [[rng.uniform(-0.1, 0.1) for _ in range(dim)] for _ in range(count)],
+        "total_duration": 1_204_512_000,
+        "load_duration": 2_100_000,
+        "prompt_eval_count": count * 96,
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def legacy(body: bytes) -> list[list[float]]:
+    return json.loads(body).get("embeddings", [])
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    dim = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    body = make_body(count, dim)
+
+    cases = [
+        ("list (json)", legacy),
+        ("float32 (json)", lambda b: JsonCodec().decode(b, "embeddings")),
+    ]
+    if HAS_ORJSON:
+        cases.append(("float32 (orjson)", lambda b: OrjsonCodec().decode(b, "embeddings")))
+    else:
+        print("orjson not installed, skipping its codec")
+
+    expected = np.asarray(legacy(body), dtype=np.float32)
+    print(f"response: {count} x {dim}, {len(body) / 2**20:.1f} MiB")
+    baseline = None
+    for name, decode in cases:
+        assert np.array_equal(np.asarray(decode(body), dtype=np.float32), expected)
+        seconds = min(timeit.repeat(partial(decode, body), number=5, repeat=5)) / 5
+        baseline = baseline or seconds
+        print(f"{name:18} {seconds * 1e3:8.2f} ms  {baseline / seconds:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from maomao import __version__
+from maomao.chunkers import Chunk, ChunkLocation, MetadataOverlay
+from maomao.chunkers.base import freeze_metadata
+
+
+def chunker_fingerprint(
+    chunker_type: str, config: dict[str, Any], inputs: dict[str, Any] | None = None
+) -> str:
+    """Identify everything besides the content that a chunker's output depends on.
+
+    ``inputs`` holds only the item metadata the chunker reads to decide how
+    to split, such as a file extension. The rest of the metadata is layered
+    over cached chunks on a hit and must not cause misses.
+    """
+    payload = json.dumps(
+        [__version__, chunker_type, config, inputs or {}],
+        sort_keys=True,
+        default=str,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+_CacheKey = tuple[str, str, str]
+
+
+class ChunkCache:
+    """SQLite store of chunk manifests, written back in batches.
+
+    New manifests and ``last_used`` bumps from hits are buffered and
+    written in one transaction every ``flush_every`` changes, on
+    ``flush()`` and on ``close()``. Eviction runs with each write-back.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 200_000, flush_every: int = 256):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = max(1, flush_every)
+        self.hits = 0
+        self.misses = 0
+        self._clock = 0.0
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        self._pending: dict[_CacheKey, tuple[str, float]] = {}
+        self._touched: dict[_CacheKey, float] = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunk_manifests (
+                    content_hash TEXT NOT NULL,
+                    chunker_type TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    manifest TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (content_hash, chunker_type, fingerprint)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_chunk_manifests_last_used "
+                "ON chunk_manifests (last_used)"
+            )
+        return self._conn
+
+    def get(
+        self,
+        content_hash: str,
+        chunker_type: str,
+        fingerprint: str,
+        content: str,
+        metadata: dict[str, Any],
+    ) -> list[Chunk] | None:
+        """Rebuild the chunks stored for this key, or None on a miss.
+
+        Chunk text that is a verbatim slice of ``content`` is not stored, so
+        it is sliced back out here. Only metadata keys the chunker added are
+        stored; they are layered over the item's current ``metadata``.
+        """
+        key = (content_hash, chunker_type, fingerprint)
+        with self._lock:
+            if key in self._pending:
+                encoded = self._pending[key][0]
+                self._pending[key] = (encoded, self._now())
+            else:
+                row = self.conn.execute(
+                    "SELECT manifest FROM chunk_manifests "
+                    "WHERE content_hash = ? AND chunker_type = ? AND fingerprint = ?",
+                    key,
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                encoded = row[0]
+                self._touched[key] = self._now()
+                self._maybe_flush()
+            self.hits += 1
+
+        base = freeze_metadata(metadata)
+        chunks: list[Chunk] = []
+        for entry in json.loads(encoded):
+            location = entry.get("location")
+            text = entry.get("content")
+            if text is None:
+                text = content[location[2] : location[3]]
+            chunks.append(Chunk(
+                content=text,
+                content_hash=entry["hash"],
+                location=ChunkLocation(*location) if location else None,
+                metadata=MetadataOverlay(base, entry.get("extra", {})),
+            ))
+        return chunks
+
+    def put(
+        self,
+        content_hash: str,
+        chunker_type: str,
+        fingerprint: str,
+        content: str,
+        metadata: dict[str, Any],
+        chunks: list[Chunk],
+    ) -> None:
+        manifest: list[dict[str, Any]] = []
+        for chunk in chunks:
+            entry: dict[str, Any] = {"hash": chunk.content_hash}
+            location = chunk.location
+            if location is not None:
+                entry["location"] = [
+                    location.start_line,
+                    location.end_line,
+                    location.char_start,
+                    location.char_end,
+                ]
+            if location is None or content[location.char_start : location.char_end] != chunk.content:
+                entry["content"] = chunk.content
+            if isinstance(chunk.metadata, MetadataOverlay):
+                extra = chunk.metadata.extra
+            else:
+                extra = {
+                    k: v
+                    for k, v in chunk.metadata.items()
+                    if k not in metadata or metadata[k] != v
+                }
+            if extra:
+                entry["extra"] = extra
+            manifest.append(entry)
+
+        try:
+            encoded = json.dumps(manifest, ensure_ascii=False)
+        except (TypeError, ValueError):
+            return
+
+        key = (content_hash, chunker_type, fingerprint)
+        with self._lock:
+            self._pending[key] = (encoded, self._now())
+            self._touched.pop(key, None)
+            self._maybe_flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def count(self) -> int:
+        with self._lock:
+            self._flush()
+            return int(self.conn.execute("SELECT COUNT(*) FROM chunk_manifests").fetchone()[0])
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self.count()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending) + len(self._touched) >= self.flush_every:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not (self._pending or self._touched):
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO chunk_manifests "
+            "(content_hash, chunker_type, fingerprint, manifest, last_used) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(*key, encoded, used) for key, (encoded, used) in self._pending.items()],
+        )
+        self.conn.executemany(
+            "UPDATE chunk_manifests SET last_used = ? "
+            "WHERE content_hash = ? AND chunker_type = ? AND fingerprint = ?",
+            [(used, *key) for key, used in self._touched.items()],
+        )
+        self._pending.clear()
+        self._touched.clear()
+        self._evict()
+        self.conn.commit()
+
+    def _evict(self) -> None:
+        count = self.conn.execute("SELECT COUNT(*) FROM chunk_manifests").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        self.conn.execute(
+            "DELETE FROM chunk_manifests WHERE rowid IN ("
+            "SELECT rowid FROM chunk_manifests ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+
+    def _now(self) -> float:
+        self._clock = max(time.time(), self._clock + 1e-6)
+        return self._clock
@@ -1,4 +1,12 @@
-from maomao.chunkers.base import Chunk, Chunker, ChunkerRegistry, ChunkLocation
+from maomao.chunkers.base import (
+    Chunk,
+    Chunker,
+    ChunkerRegistry,
+    ChunkLocation,
+    LineIndex,
+    MetadataOverlay,
+)
+from maomao.chunkers.code import CodeChunker
 from maomao.chunkers.markdown import MarkdownChunker
 from maomao.chunkers.text import TextChunker
 
@@ -7,9 +15,13 @@ __all__ = [
     "Chunker",
     "ChunkerRegistry",
     "ChunkLocation",
+    "CodeChunker",
+    "LineIndex",
     "MarkdownChunker",
+    "MetadataOverlay",
     "TextChunker",
 ]
 
 ChunkerRegistry.register(MarkdownChunker)
 ChunkerRegistry.register(TextChunker)
+ChunkerRegistry.register(CodeChunker)
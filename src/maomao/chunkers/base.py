@@ -1,10 +1,68 @@
+import re
 from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections.abc import Iterator, Mapping
 from dataclasses import dataclass, field
+from types import MappingProxyType
 from typing import Any
 from uuid import uuid4
 
+from maomao.chunkers.tokens import TokenCounter, get_token_counter
+from maomao.lazy import lazy_defaults
 
-@dataclass
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+NEWLINE = re.compile(r"\n")
+SENTENCE_BREAK = re.compile(r"[。！？…]+[”’」』）)]*|[.!?]+[\"')\]]*(?=\s)|\n")
+CLAUSE_BREAK = re.compile(r"[，、；：]+|[,;:]+(?=\s)")
+
+
+EMPTY_METADATA: Mapping[str, Any] = MappingProxyType({})
+
+
+class MetadataOverlay(Mapping[str, Any]):
+    """Read-only view of a few chunk-specific keys over shared item metadata.
+
+    Every chunk of an item points at the same ``base`` instead of copying
+    frontmatter and paths into its own dict.
+    """
+
+    __slots__ = ("base", "extra")
+
+    def __init__(self, base: Mapping[str, Any], extra: dict[str, Any]):
+        self.base = base
+        self.extra = extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self.extra:
+            return self.extra[key]
+        return self.base[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.extra or key in self.base
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.extra
+        yield from (key for key in self.base if key not in self.extra)
+
+    def __len__(self) -> int:
+        return len(self.extra) + sum(1 for key in self.base if key not in self.extra)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**self.base, **self.extra}
+
+
+def freeze_metadata(metadata: Mapping[str, Any] | None) -> Mapping[str, Any]:
+    if not metadata:
+        return EMPTY_METADATA
+    if isinstance(metadata, MappingProxyType):
+        return metadata
+    return MappingProxyType(metadata)
+
+
+@dataclass(slots=True)
 class ChunkLocation:
     start_line: int = 0
     end_line: int = 0
@@ -12,16 +70,30 @@ class ChunkLocation:
     char_end: int = 0
 
 
-@dataclass
+@lazy_defaults(id=lambda _: str(uuid4()))
+@dataclass(slots=True)
 class Chunk:
-    id: str = field(default_factory=lambda: str(uuid4()))
+    id: str | None = None
     content: str = ""
-    metadata: dict[str, Any] = field(default_factory=dict)
+    metadata: Mapping[str, Any] = field(default_factory=dict)
     content_hash: str = ""
     location: ChunkLocation | None = None
 
 
+class LineIndex:
+    def __init__(self, text: str):
+        self.starts = [0]
+        self.starts.extend(match.end() for match in NEWLINE.finditer(text))
+
+    def line_at(self, offset: int) -> int:
+        return bisect_right(self.starts, offset)
+
+
 class Chunker(ABC):
+    token_counter: TokenCounter | None = None
+    # Item metadata keys that change how content is split.
+    metadata_inputs: tuple[str, ...] = ()
+
     @classmethod
     @abstractmethod
     def chunker_type(cls) -> str:
@@ -33,29 +105,114 @@ class Chunker(ABC):
         pass
 
     @abstractmethod
-    def chunk(self, content: str, metadata: dict[str, Any] | None = None) -> list[Chunk]:
-        pass
+    def chunk(
+        self,
+        content: str,
+        metadata: dict[str, Any] | None = None,
+        source_id: str | None = None,
+    ) -> list[Chunk]:
+        """Split ``content`` into chunks.
+
+        ``source_id`` names the item the content came from, for chunkers
+        that keep per-item state between calls; others ignore it.
+        """
+
+    @staticmethod
+    def _token_counter_from_config(config: dict[str, Any]) -> TokenCounter | None:
+        if config.get("size_unit", "chars") != "tokens":
+            return None
+        return get_token_counter(config.get("tokenizer") or None)
+
+    def _measure(self, text: str) -> int:
+        if self.token_counter is None:
+            return len(text)
+        return self.token_counter.count(text)
+
+    def _span_size(self, content: str, start: int, end: int) -> int:
+        if self.token_counter is None:
+            return end - start
+        return self.token_counter.count(content[start:end])
 
     def _compute_hash(self, content: str) -> str:
         import hashlib
         return hashlib.sha256(content.encode()).hexdigest()[:16]
 
-    def _compute_location(self, content: str, full_content: str) -> ChunkLocation:
-        char_start = full_content.find(content)
-        if char_start == -1:
-            return ChunkLocation()
-
-        char_end = char_start + len(content)
-        start_line = full_content[:char_start].count('\n') + 1
-        end_line = full_content[:char_end].count('\n') + 1
-
+    def _compute_location(self, lines: LineIndex, char_start: int, char_end: int) -> ChunkLocation:
         return ChunkLocation(
-            start_line=start_line,
-            end_line=end_line,
+            start_line=lines.line_at(char_start),
+            end_line=lines.line_at(char_end),
             char_start=char_start,
             char_end=char_end,
         )
 
+    def _strip_span(self, content: str, start: int, end: int) -> tuple[int, int]:
+        text = content[start:end]
+        stripped = text.lstrip()
+        start += len(text) - len(stripped)
+        return start, start + len(stripped.rstrip())
+
+    def _paragraph_spans(
+        self, content: str, start: int = 0, end: int | None = None
+    ) -> list[tuple[int, int]]:
+        end = len(content) if end is None else end
+        spans: list[tuple[int, int]] = []
+        for match in PARAGRAPH_BREAK.finditer(content, start, end):
+            spans.append(self._strip_span(content, start, match.start()))
+            start = match.end()
+        spans.append(self._strip_span(content, start, end))
+        return [(s, e) for s, e in spans if e > s]
+
+    def _bounded_spans(
+        self, content: str, spans: list[tuple[int, int]], limit: int
+    ) -> list[tuple[int, int, bool]]:
+        """Split spans longer than ``limit`` into pieces that fit.
+
+        Pieces break after the last sentence end inside the window, else
+        after the last clause mark, else at the hard limit. Boundaries are
+        found with one regex pass per oversized span and bisected, so the
+        work stays linear. In token mode the character window is scaled by
+        the span's token density and shrunk if a piece still measures over.
+        The flag is True for pieces that continue the previous span.
+        """
+        bounded: list[tuple[int, int, bool]] = []
+        for start, end in spans:
+            size = self._span_size(content, start, end)
+            if size <= limit:
+                bounded.append((start, end, False))
+                continue
+
+            chars = max(1, (end - start) * limit // size)
+            sentences = [m.end() for m in SENTENCE_BREAK.finditer(content, start, end)]
+            clauses = [m.end() for m in CLAUSE_BREAK.finditer(content, start, end)]
+            continued = False
+            pos = start
+            while pos < end:
+                window = min(end, pos + chars)
+                while True:
+                    cut = window
+                    if window < end:
+                        cut = (
+                            self._last_break(sentences, pos, window)
+                            or self._last_break(clauses, pos, window)
+                            or window
+                        )
+                    piece_size = self._span_size(content, pos, cut)
+                    if piece_size <= limit or cut - pos <= 1:
+                        break
+                    window = pos + max(1, (cut - pos) * limit // piece_size)
+                piece_start, piece_end = self._strip_span(content, pos, cut)
+                if piece_end > piece_start:
+                    bounded.append((piece_start, piece_end, continued))
+                    continued = True
+                pos = cut
+        return bounded
+
+    def _last_break(self, breaks: list[int], start: int, end: int) -> int | None:
+        index = bisect_right(breaks, end) - 1
+        if index >= 0 and breaks[index] > start:
+            return breaks[index]
+        return None
+
 
 class ChunkerRegistry:
     _chunkers: dict[str, type[Chunker]] = {}
@@ -0,0 +1,417 @@
+import importlib
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+from functools import cache
+from typing import Any
+
+import numpy as np
+
+from maomao.chunkers.base import (
+    Chunk,
+    Chunker,
+    ChunkerRegistry,
+    LineIndex,
+    MetadataOverlay,
+    freeze_metadata,
+)
+from maomao.chunkers.text import TextChunker
+
+EXTENSION_LANGUAGE_MAP = {
+    ".py": "python",
+    ".pyi": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".mjs": "javascript",
+    ".cjs": "javascript",
+    ".ts": "typescript",
+    ".mts": "typescript",
+    ".cts": "typescript",
+    ".tsx": "tsx",
+    ".go": "go",
+    ".rs": "rust",
+    ".java": "java",
+}
+
+GRAMMARS = {
+    "python": ("tree_sitter_python", "language"),
+    "javascript": ("tree_sitter_javascript", "language"),
+    "typescript": ("tree_sitter_typescript", "language_typescript"),
+    "tsx": ("tree_sitter_typescript", "language_tsx"),
+    "go": ("tree_sitter_go", "language"),
+    "rust": ("tree_sitter_rust", "language"),
+    "java": ("tree_sitter_java", "language"),
+}
+
+DEFINITION_TYPES = {
+    "python": {"function_definition", "class_definition", "decorated_definition"},
+    "javascript": {
+        "function_declaration",
+        "generator_function_declaration",
+        "class_declaration",
+        "lexical_declaration",
+        "export_statement",
+    },
+    "typescript": {
+        "function_declaration",
+        "generator_function_declaration",
+        "class_declaration",
+        "abstract_class_declaration",
+        "interface_declaration",
+        "type_alias_declaration",
+        "enum_declaration",
+        "lexical_declaration",
+        "export_statement",
+        "internal_module",
+    },
+    "go": {"function_declaration", "method_declaration", "type_declaration"},
+    "rust": {
+        "function_item",
+        "impl_item",
+        "struct_item",
+        "enum_item",
+        "trait_item",
+        "mod_item",
+        "macro_definition",
+    },
+    "java": {
+        "class_declaration",
+        "interface_declaration",
+        "enum_declaration",
+        "record_declaration",
+        "annotation_type_declaration",
+    },
+}
+DEFINITION_TYPES["tsx"] = DEFINITION_TYPES["typescript"]
+
+LEADING_TYPES = {"comment", "line_comment", "block_comment", "attribute_item", "decorator"}
+
+
+@cache
+def get_language(name: str) -> Any | None:
+    """Load a tree-sitter language once per process, or None if unavailable."""
+    if name not in GRAMMARS:
+        return None
+    module_name, attr = GRAMMARS[name]
+    try:
+        from tree_sitter import Language
+
+        grammar = getattr(importlib.import_module(module_name), attr)()
+    except (ImportError, AttributeError):
+        return None
+    return Language(grammar)
+
+
+_parsers = threading.local()
+
+
+def get_parser(name: str) -> Any | None:
+    """Return this thread's parser for ``name``; parsers are not thread-safe."""
+    cached: dict[str, Any] = _parsers.__dict__.setdefault("by_language", {})
+    if name not in cached:
+        language = get_language(name)
+        if language is None:
+            return None
+        from tree_sitter import Parser
+
+        cached[name] = Parser(language)
+    return cached[name]
+
+
+def _common_prefix(a: bytes, b: bytes) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _point(data: bytes, offset: int) -> tuple[int, int]:
+    row = data.count(b"\n", 0, offset)
+    return row, offset - (data.rfind(b"\n", 0, offset) + 1)
+
+
+class _CharOffsets:
+    """Map byte offsets into UTF-8 ``data`` to character offsets.
+
+    tree-sitter reports byte positions, while chunk sizes and locations are
+    in characters. Each byte that does not continue a multi-byte sequence
+    starts a character, so a prefix sum over those bytes gives the mapping.
+    """
+
+    __slots__ = ("_starts",)
+
+    def __init__(self, data: bytes):
+        self._starts: np.ndarray | None = None
+        if not data.isascii():
+            leading = (np.frombuffer(data, dtype=np.uint8) & 0xC0) != 0x80
+            self._starts = np.concatenate(([0], np.cumsum(leading)))
+
+    def __getitem__(self, offset: int) -> int:
+        if self._starts is None:
+            return offset
+        return int(self._starts[offset])
+
+    def size(self, start: int, end: int) -> int:
+        return self[end] - self[start]
+
+
+@ChunkerRegistry.register
+class CodeChunker(Chunker):
+    metadata_inputs = ("extension",)
+
+    def __init__(
+        self,
+        max_chunk_size: int = 1500,
+        min_chunk_size: int = 50,
+        language: str | None = None,
+        max_cached_trees: int = 256,
+    ):
+        self.max_chunk_size = max_chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.language = language
+        self.max_cached_trees = max_cached_trees
+        self._trees: OrderedDict[str, tuple[str, bytes, Any]] = OrderedDict()
+        self._trees_lock = threading.Lock()
+        self._fallback = TextChunker(
+            chunk_size=max_chunk_size, chunk_overlap=0, min_chunk_size=min_chunk_size
+        )
+
+    @classmethod
+    def chunker_type(cls) -> str:
+        return "code"
+
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "CodeChunker":
+        return cls(
+            max_chunk_size=config.get("max_chunk_size", 1500),
+            min_chunk_size=config.get("min_chunk_size", 50),
+            language=config.get("language"),
+            max_cached_trees=config.get("max_cached_trees", 256),
+        )
+
+    def chunk(
+        self,
+        content: str,
+        metadata: dict[str, Any] | None = None,
+        source_id: str | None = None,
+    ) -> list[Chunk]:
+        """Split source code along top-level definitions.
+
+        With ``source_id``, the previous tree for that file is kept and the
+        next call re-parses incrementally from it. Files in languages without
+        an installed grammar fall back to paragraph chunking.
+        """
+        language = self._detect_language(metadata)
+        parser = get_parser(language) if language else None
+        if language is None or parser is None:
+            return self._fallback.chunk(content, metadata)
+
+        data = content.encode("utf-8")
+        chars = _CharOffsets(data)
+        tree = self._parse(parser, language, data, source_id)
+
+        spans = self._group(language, tree.root_node.children, chars, top_level=True)
+        return self._create_chunks(content, chars, spans, language, freeze_metadata(metadata))
+
+    def forget(self, source_id: str) -> None:
+        with self._trees_lock:
+            self._trees.pop(source_id, None)
+
+    def _detect_language(self, metadata: dict[str, Any] | None) -> str | None:
+        if self.language:
+            return self.language
+        extension = str((metadata or {}).get("extension", "")).lower()
+        return EXTENSION_LANGUAGE_MAP.get(extension)
+
+    def _parse(self, parser: Any, language: str, data: bytes, source_id: str | None) -> Any:
+        previous = None
+        if source_id is not None:
+            with self._trees_lock:
+                previous = self._trees.pop(source_id, None)
+
+        if previous is not None and previous[0] == language:
+            old_data, tree = previous[1], previous[2]
+            if old_data != data:
+                self._edit(tree, old_data, data)
+                tree = parser.parse(data, tree)
+        else:
+            tree = parser.parse(data)
+
+        if source_id is not None:
+            with self._trees_lock:
+                self._trees[source_id] = (language, data, tree)
+                while len(self._trees) > self.max_cached_trees:
+                    self._trees.popitem(last=False)
+        return tree
+
+    def _edit(self, tree: Any, old: bytes, new: bytes) -> None:
+        start = _common_prefix(old, new)
+        suffix = _common_prefix(old[start:][::-1], new[start:][::-1])
+        old_end = len(old) - suffix
+        new_end = len(new) - suffix
+        tree.edit(
+            start_byte=start,
+            old_end_byte=old_end,
+            new_end_byte=new_end,
+            start_point=_point(old, start),
+            old_end_point=_point(old, old_end),
+            new_end_point=_point(new, new_end),
+        )
+
+    def _units(self, language: str, nodes: list[Any]) -> list[tuple[int, int, Any]]:
+        """Attach comments and attributes directly above a definition to it."""
+        definitions = DEFINITION_TYPES.get(language, set())
+        units: list[tuple[int, int, Any]] = []
+        pending: list[Any] = []
+        for node in nodes:
+            if node.type in LEADING_TYPES:
+                if pending and pending[-1].end_point[0] + 1 < node.start_point[0]:
+                    units.extend((n.start_byte, n.end_byte, None) for n in pending)
+                    pending = []
+                pending.append(node)
+                continue
+            is_definition = node.type in definitions
+            if pending and is_definition and pending[-1].end_point[0] + 1 >= node.start_point[0]:
+                units.append((pending[0].start_byte, node.end_byte, node))
+            else:
+                units.extend((n.start_byte, n.end_byte, None) for n in pending)
+                units.append((node.start_byte, node.end_byte, node if is_definition else None))
+            pending = []
+        units.extend((n.start_byte, n.end_byte, None) for n in pending)
+        return units
+
+    def _group(
+        self, language: str, nodes: list[Any], chars: _CharOffsets, top_level: bool = False
+    ) -> list[tuple[int, int, list[Any]]]:
+        """Merge adjacent units into spans of at most ``max_chunk_size`` characters.
+
+        At the top level every definition starts its own span once the
+        current span has reached ``min_chunk_size``. Oversized units are
+        split along their children, and leaf nodes along lines.
+        """
+        spans: list[tuple[int, int, list[Any]]] = []
+        current: tuple[int, int, list[Any]] | None = None
+
+        for start, end, definition in self._units(language, nodes):
+            if chars.size(start, end) > self.max_chunk_size:
+                node = definition or next(
+                    n for n in nodes if n.start_byte <= start and n.end_byte >= end
+                )
+                leading = [definition] if definition is not None else []
+                if current is not None:
+                    if top_level:
+                        spans.append(current)
+                    else:
+                        start, leading = current[0], current[2] + leading
+                    current = None
+                pieces = self._split_node(language, node, start, chars)
+                if pieces and leading:
+                    first = pieces[0]
+                    pieces[0] = (first[0], first[1], [*leading, *first[2]])
+                spans.extend(pieces)
+                continue
+
+            definitions = [definition] if definition is not None else []
+            if current is not None:
+                fits = chars.size(current[0], end) <= self.max_chunk_size
+                separate = (
+                    top_level
+                    and definition is not None
+                    and chars.size(current[0], current[1]) >= self.min_chunk_size
+                )
+                if fits and not separate:
+                    current = (current[0], end, current[2] + definitions)
+                    continue
+                spans.append(current)
+            current = (start, end, definitions)
+
+        if current is not None:
+            spans.append(current)
+        return spans
+
+    def _split_node(
+        self, language: str, node: Any, start: int, chars: _CharOffsets
+    ) -> list[tuple[int, int, list[Any]]]:
+        children = [child for child in node.children if child.end_byte > child.start_byte]
+        if not children:
+            return self._split_lines(node.text or b"", node.start_byte, start, chars)
+
+        spans = self._group(language, children, chars)
+        if spans and start < spans[0][0]:
+            first = spans[0]
+            if chars.size(start, first[1]) <= self.max_chunk_size:
+                spans[0] = (start, first[1], first[2])
+            else:
+                spans.insert(0, (start, first[0], []))
+        return spans
+
+    def _split_lines(
+        self, text: bytes, offset: int, start: int, chars: _CharOffsets
+    ) -> list[tuple[int, int, list[Any]]]:
+        spans: list[tuple[int, int, list[Any]]] = []
+        span_start = start
+        pos = 0
+        while pos < len(text):
+            newline = text.find(b"\n", pos)
+            line_end = len(text) if newline == -1 else newline + 1
+            too_long = chars.size(span_start, offset + line_end) > self.max_chunk_size
+            if too_long and offset + pos > span_start:
+                spans.append((span_start, offset + pos, []))
+                span_start = offset + pos
+            pos = line_end
+        if offset + len(text) > span_start:
+            spans.append((span_start, offset + len(text), []))
+        return spans
+
+    def _create_chunks(
+        self,
+        content: str,
+        chars: _CharOffsets,
+        spans: list[tuple[int, int, list[Any]]],
+        language: str,
+        metadata: Mapping[str, Any],
+    ) -> list[Chunk]:
+        chunks: list[Chunk] = []
+        lines = LineIndex(content)
+
+        for start_byte, end_byte, definitions in spans:
+            char_start, char_end = self._strip_span(content, chars[start_byte], chars[end_byte])
+            text = content[char_start:char_end]
+            if not text or len(text) < self.min_chunk_size and not definitions:
+                continue
+
+            chunks.append(Chunk(
+                content=text,
+                content_hash=self._compute_hash(text),
+                location=self._compute_location(lines, char_start, char_end),
+                metadata=MetadataOverlay(metadata, {
+                    "language": language,
+                    "symbols": [name for node in definitions if (name := self._symbol(node))],
+                }),
+            ))
+
+        return chunks
+
+    def _symbol(self, node: Any) -> str:
+        target = node
+        for field in ("definition", "declaration"):
+            inner = target.child_by_field_name(field)
+            if inner is not None:
+                target = inner
+        name = target.child_by_field_name("name")
+        if name is None and target.type == "lexical_declaration":
+            declarator = next(
+                (c for c in target.named_children if c.type == "variable_declarator"), None
+            )
+            name = declarator.child_by_field_name("name") if declarator is not None else None
+        if name is None and target.type == "type_declaration":
+            spec = next((c for c in target.named_children if c.type == "type_spec"), None)
+            name = spec.child_by_field_name("name") if spec is not None else None
+        if name is None or name.text is None:
+            return ""
+        symbol: str = name.text.decode("utf-8", "replace")
+        return symbol
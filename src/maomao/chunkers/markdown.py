@@ -1,7 +1,31 @@
 import re
+from collections.abc import Mapping
+from dataclasses import dataclass
 from typing import Any
 
-from maomao.chunkers.base import Chunk, Chunker, ChunkerRegistry
+from maomao.chunkers.base import (
+    Chunk,
+    Chunker,
+    ChunkerRegistry,
+    LineIndex,
+    MetadataOverlay,
+    freeze_metadata,
+)
+from maomao.chunkers.tokens import TokenCounter
+
+HEADING = re.compile(r"(#{1,6})\s+(.+)")
+FENCE = re.compile(r" {0,3}(`{3,}|~{3,})")
+BLANK = re.compile(r"\s*")
+
+
+@dataclass
+class Block:
+    kind: str
+    start: int
+    end: int
+    gap: bool = False
+    level: int = 0
+    title: str = ""
 
 
 @ChunkerRegistry.register
@@ -11,10 +35,12 @@ class MarkdownChunker(Chunker):
         max_chunk_size: int = 1000,
         min_chunk_size: int = 50,
         heading_levels: list[int] | None = None,
+        token_counter: TokenCounter | None = None,
     ):
         self.max_chunk_size = max_chunk_size
         self.min_chunk_size = min_chunk_size
         self.heading_levels = heading_levels or [2, 3]
+        self.token_counter = token_counter
 
     @classmethod
     def chunker_type(cls) -> str:
@@ -26,165 +52,259 @@ class MarkdownChunker(Chunker):
             max_chunk_size=config.get("max_chunk_size", 1000),
             min_chunk_size=config.get("min_chunk_size", 50),
             heading_levels=config.get("heading_levels"),
+            token_counter=cls._token_counter_from_config(config),
         )
 
-    def chunk(self, content: str, metadata: dict[str, Any] | None = None) -> list[Chunk]:
+    def chunk(
+        self,
+        content: str,
+        metadata: dict[str, Any] | None = None,
+        source_id: str | None = None,
+    ) -> list[Chunk]:
         chunks: list[Chunk] = []
-        sections = self._split_by_headings(content)
+        base_metadata = freeze_metadata(metadata)
+        lines = LineIndex(content)
+        sections = self._split_by_headings(self._tokenize(content), len(content))
 
         for section in sections:
-            if len(section["content"]) < self.min_chunk_size:
+            size = self._span_size(content, section["start"], section["end"])
+            if size < self.min_chunk_size:
                 continue
 
-            if len(section["content"]) <= self.max_chunk_size:
-                chunks.append(self._create_chunk(section, metadata, content))
+            if size <= self.max_chunk_size:
+                chunks.append(self._create_section_chunk(section, base_metadata, content, lines))
             else:
-                sub_chunks = self._split_large_section(section, metadata, content)
+                sub_chunks = self._split_large_section(section, base_metadata, content, lines)
                 chunks.extend(sub_chunks)
 
         return chunks
 
-    def _split_by_headings(self, content: str) -> list[dict[str, Any]]:
+    def _tokenize(self, content: str) -> list[Block]:
+        """Group lines into heading, fence and text blocks in a single pass.
+
+        ``gap`` marks a block preceded by a blank line, i.e. the start of a
+        new paragraph. Fenced code is one block, so headings and blank lines
+        inside it never split a section or paragraph.
+        """
+        blocks: list[Block] = []
+        fence: str | None = None
+        gap = True
+        pos = 0
+        size = len(content)
+
+        while pos < size:
+            end = content.find("\n", pos)
+            if end == -1:
+                end = size
+
+            if fence is not None:
+                blocks[-1].end = end
+                match = FENCE.match(content, pos, end)
+                if (
+                    match
+                    and match.group(1)[0] == fence[0]
+                    and len(match.group(1)) >= len(fence)
+                    and BLANK.fullmatch(content, match.end(), end)
+                ):
+                    fence = None
+            elif match := FENCE.match(content, pos, end):
+                fence = match.group(1)
+                blocks.append(Block("fence", pos, end, gap))
+                gap = False
+            elif BLANK.fullmatch(content, pos, end):
+                gap = True
+            elif match := HEADING.fullmatch(content, pos, end):
+                level = len(match.group(1))
+                blocks.append(Block("heading", pos, end, gap, level, match.group(2).strip()))
+                gap = False
+            elif blocks and blocks[-1].kind == "text" and not gap:
+                blocks[-1].end = end
+            else:
+                blocks.append(Block("text", pos, end, gap))
+                gap = False
+
+            pos = end + 1
+
+        return blocks
+
+    def _split_by_headings(self, blocks: list[Block], size: int) -> list[dict[str, Any]]:
         sections: list[dict[str, Any]] = []
-        lines = content.split("\n")
 
         current_section: dict[str, Any] = {
             "title": "",
             "level": 0,
-            "content": "",
             "path": [],
+            "start": 0,
+            "blocks": [],
         }
 
-        for line in lines:
-            heading_match = re.match(r"^(#{1,6})\s+(.+)$", line)
-
-            if heading_match:
-                level = len(heading_match.group(1))
-                title = heading_match.group(2).strip()
-
-                if current_section["content"].strip():
+        for block in blocks:
+            if block.kind == "heading":
+                if current_section["blocks"]:
+                    current_section["end"] = block.start
                     sections.append(current_section)
 
+                level = block.level
                 current_section = {
-                    "title": title,
+                    "title": block.title,
                     "level": level,
-                    "content": line + "\n",
-                    "path": current_section["path"][:level-1] + [title] if level > 0 else [title],
+                    "path": current_section["path"][:level-1] + [block.title],
+                    "start": block.start,
+                    "blocks": [block],
                 }
             else:
-                current_section["content"] += line + "\n"
+                current_section["blocks"].append(block)
 
-        if current_section["content"].strip():
+        if current_section["blocks"]:
+            current_section["end"] = size
             sections.append(current_section)
 
         return sections
 
     def _split_large_section(
-        self, section: dict[str, Any], base_metadata: dict[str, Any] | None, full_content: str
+        self,
+        section: dict[str, Any],
+        base_metadata: Mapping[str, Any],
+        content: str,
+        lines: LineIndex,
     ) -> list[Chunk]:
-        content = section["content"]
-
         if section["level"] < max(self.heading_levels):
-            sub_sections = self._split_by_sub_headings(content, section["level"] + 1)
+            sub_sections = self._split_by_sub_headings(section, section["level"] + 1)
             if len(sub_sections) > 1:
                 chunks: list[Chunk] = []
                 for sub in sub_sections:
-                    if len(sub["content"]) >= self.min_chunk_size:
-                        if len(sub["content"]) <= self.max_chunk_size:
-                            chunks.append(self._create_chunk(sub, base_metadata, full_content))
+                    size = self._span_size(content, sub["start"], sub["end"])
+                    if size >= self.min_chunk_size:
+                        if size <= self.max_chunk_size:
+                            chunks.append(
+                                self._create_section_chunk(sub, base_metadata, content, lines)
+                            )
                         else:
-                            chunks.extend(self._split_by_paragraphs(sub, base_metadata, full_content))
+                            chunks.extend(
+                                self._split_by_paragraphs(sub, base_metadata, content, lines)
+                            )
                 return chunks
 
-        return self._split_by_paragraphs(section, base_metadata, full_content)
+        return self._split_by_paragraphs(section, base_metadata, content, lines)
 
     def _split_by_sub_headings(
-        self, content: str, min_level: int
+        self, section: dict[str, Any], min_level: int
     ) -> list[dict[str, Any]]:
         sections: list[dict[str, Any]] = []
-        lines = content.split("\n")
 
         current_section: dict[str, Any] = {
             "title": "",
             "level": 0,
-            "content": "",
             "path": [],
+            "start": section["start"],
+            "blocks": [],
         }
 
-        for line in lines:
-            heading_match = re.match(r"^(#{1,6})\s+(.+)$", line)
-
-            if heading_match:
-                level = len(heading_match.group(1))
-                title = heading_match.group(2).strip()
-
-                if level >= min_level and current_section["content"].strip():
-                    sections.append(current_section)
-                    current_section = {
-                        "title": title,
-                        "level": level,
-                        "content": line + "\n",
-                        "path": [title],
-                    }
-                else:
-                    current_section["content"] += line + "\n"
+        for block in section["blocks"]:
+            if block.kind == "heading" and block.level >= min_level and current_section["blocks"]:
+                current_section["end"] = block.start
+                sections.append(current_section)
+                current_section = {
+                    "title": block.title,
+                    "level": block.level,
+                    "path": [block.title],
+                    "start": block.start,
+                    "blocks": [block],
+                }
             else:
-                current_section["content"] += line + "\n"
+                current_section["blocks"].append(block)
 
-        if current_section["content"].strip():
+        if current_section["blocks"]:
+            current_section["end"] = section["end"]
             sections.append(current_section)
 
         return sections
 
+    def _paragraphs(self, blocks: list[Block], content: str) -> list[tuple[int, int]]:
+        spans: list[tuple[int, int]] = []
+        start = end = -1
+        for block in blocks:
+            if block.gap and start >= 0:
+                spans.append(self._strip_span(content, start, end))
+                start = -1
+            if start < 0:
+                start = block.start
+            end = block.end
+        if start >= 0:
+            spans.append(self._strip_span(content, start, end))
+        return [(s, e) for s, e in spans if e > s]
+
     def _split_by_paragraphs(
-        self, section: dict[str, Any], base_metadata: dict[str, Any] | None, full_content: str
+        self,
+        section: dict[str, Any],
+        base_metadata: Mapping[str, Any],
+        content: str,
+        lines: LineIndex,
     ) -> list[Chunk]:
-        content = section["content"]
-        paragraphs = re.split(r"\n\s*\n", content)
-
         chunks: list[Chunk] = []
-        current_content = ""
-
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
-
-            if len(current_content) + len(para) + 2 <= self.max_chunk_size:
-                current_content += "\n\n" + para if current_content else para
+        current: list[str] = []
+        current_size = 0
+        current_start = current_end = 0
+
+        paragraphs = self._paragraphs(section["blocks"], content)
+        for start, end, continued in self._bounded_spans(content, paragraphs, self.max_chunk_size):
+            size = self._span_size(content, start, end)
+            joiner = content[current_end:start] if continued else "\n\n"
+            joiner_size = self._measure(joiner)
+
+            if not current or current_size + joiner_size + size <= self.max_chunk_size:
+                if current:
+                    current.append(joiner)
+                    current_size += joiner_size
+                else:
+                    current_start = start
+                current.append(content[start:end])
+                current_size += size
+                current_end = end
             else:
-                if current_content and len(current_content) >= self.min_chunk_size:
-                    chunks.append(self._create_chunk({
-                        "title": section["title"],
-                        "level": section["level"],
-                        "content": current_content,
-                        "path": section["path"],
-                    }, base_metadata, full_content))
-                current_content = para
-
-        if current_content and len(current_content) >= self.min_chunk_size:
-            chunks.append(self._create_chunk({
-                "title": section["title"],
-                "level": section["level"],
-                "content": current_content,
-                "path": section["path"],
-            }, base_metadata, full_content))
+                if current_size >= self.min_chunk_size:
+                    chunks.append(self._create_chunk(
+                        section, base_metadata, "".join(current),
+                        current_start, current_end, lines,
+                    ))
+                current = [content[start:end]]
+                current_size = size
+                current_start, current_end = start, end
+
+        if current and current_size >= self.min_chunk_size:
+            chunks.append(self._create_chunk(
+                section, base_metadata, "".join(current),
+                current_start, current_end, lines,
+            ))
 
         return chunks
 
+    def _create_section_chunk(
+        self,
+        section: dict[str, Any],
+        base_metadata: Mapping[str, Any],
+        content: str,
+        lines: LineIndex,
+    ) -> Chunk:
+        start, end = self._strip_span(content, section["start"], section["end"])
+        return self._create_chunk(section, base_metadata, content[start:end], start, end, lines)
+
     def _create_chunk(
-        self, section: dict[str, Any], base_metadata: dict[str, Any] | None, full_content: str
+        self,
+        section: dict[str, Any],
+        base_metadata: Mapping[str, Any],
+        content: str,
+        char_start: int,
+        char_end: int,
+        lines: LineIndex,
     ) -> Chunk:
-        content = section["content"].strip()
-        location = self._compute_location(content, full_content)
         return Chunk(
             content=content,
             content_hash=self._compute_hash(content),
-            location=location,
-            metadata={
-                **(base_metadata or {}),
+            location=self._compute_location(lines, char_start, char_end),
+            metadata=MetadataOverlay(base_metadata, {
                 "title": section["title"],
                 "heading_level": section["level"],
                 "heading_path": section["path"],
-            },
+            }),
         )
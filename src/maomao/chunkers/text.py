@@ -1,7 +1,15 @@
-import re
+from collections.abc import Mapping
 from typing import Any
 
-from maomao.chunkers.base import Chunk, Chunker, ChunkerRegistry
+from maomao.chunkers.base import (
+    Chunk,
+    Chunker,
+    ChunkerRegistry,
+    LineIndex,
+    MetadataOverlay,
+    freeze_metadata,
+)
+from maomao.chunkers.tokens import TokenCounter
 
 
 @ChunkerRegistry.register
@@ -11,10 +19,12 @@ class TextChunker(Chunker):
         chunk_size: int = 512,
         chunk_overlap: int = 50,
         min_chunk_size: int = 50,
+        token_counter: TokenCounter | None = None,
     ):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.min_chunk_size = min_chunk_size
+        self.token_counter = token_counter
 
     @classmethod
     def chunker_type(cls) -> str:
@@ -26,60 +36,99 @@ class TextChunker(Chunker):
             chunk_size=config.get("chunk_size", 512),
             chunk_overlap=config.get("chunk_overlap", 50),
             min_chunk_size=config.get("min_chunk_size", 50),
+            token_counter=cls._token_counter_from_config(config),
         )
 
-    def chunk(self, content: str, metadata: dict[str, Any] | None = None) -> list[Chunk]:
+    def chunk(
+        self,
+        content: str,
+        metadata: dict[str, Any] | None = None,
+        source_id: str | None = None,
+    ) -> list[Chunk]:
         chunks: list[Chunk] = []
-        paragraphs = self._split_paragraphs(content)
+        base_metadata = freeze_metadata(metadata)
+        lines = LineIndex(content)
+        limit = max(self.chunk_size - self.chunk_overlap, self.chunk_size // 2, 1)
+        spans = self._bounded_spans(content, self._paragraph_spans(content), limit)
 
         current_chunk = ""
+        current_size = 0
+        current_start = current_end = 0
         chunk_index = 0
 
-        for para in paragraphs:
-            if len(current_chunk) + len(para) > self.chunk_size:
-                if current_chunk and len(current_chunk) >= self.min_chunk_size:
+        for start, end, continued in spans:
+            para = content[start:end]
+            para_size = self._measure(para)
+            joiner = content[current_end:start] if continued else "\n\n"
+            joiner_size = self._measure(joiner)
+            if current_chunk and current_size + joiner_size + para_size > self.chunk_size:
+                if current_size >= self.min_chunk_size:
                     chunks.append(self._create_chunk(
                         current_chunk.strip(),
-                        content,
-                        metadata,
+                        lines,
+                        current_start,
+                        current_end,
+                        base_metadata,
                         chunk_index,
                     ))
                     chunk_index += 1
 
-                overlap = current_chunk[-self.chunk_overlap :] if self.chunk_overlap > 0 else ""
+                overlap = self._overlap(current_chunk, current_size, self.chunk_size - para_size)
+                trimmed = overlap.lstrip()
+                current_start = max(0, current_end - len(trimmed)) if trimmed else start
                 current_chunk = overlap + para
+                current_size = self._measure(current_chunk)
             else:
-                current_chunk += "\n\n" + para if current_chunk else para
+                if not current_chunk:
+                    current_start = start
+                    current_chunk = para
+                    current_size = para_size
+                else:
+                    current_chunk += joiner + para
+                    current_size += joiner_size + para_size
+            current_end = end
 
-        if current_chunk and len(current_chunk) >= self.min_chunk_size:
+        if current_chunk and current_size >= self.min_chunk_size:
             chunks.append(self._create_chunk(
                 current_chunk.strip(),
-                content,
-                metadata,
+                lines,
+                current_start,
+                current_end,
+                base_metadata,
                 chunk_index,
             ))
 
         return chunks
 
-    def _split_paragraphs(self, content: str) -> list[str]:
-        paragraphs = re.split(r"\n\s*\n", content)
-        return [p.strip() for p in paragraphs if p.strip()]
+    def _overlap(self, text: str, size: int, room: int) -> str:
+        budget = min(self.chunk_overlap, room)
+        if budget <= 0:
+            return ""
+        if self.token_counter is None:
+            return text[-budget:]
+        chars = max(1, len(text) * budget // max(size, 1))
+        overlap = text[-chars:]
+        while chars > 1 and self._measure(overlap) > budget:
+            chars //= 2
+            overlap = text[-chars:]
+        return overlap
 
     def _create_chunk(
         self,
         chunk_content: str,
-        full_content: str,
-        metadata: dict[str, Any] | None,
+        lines: LineIndex,
+        char_start: int,
+        char_end: int,
+        metadata: Mapping[str, Any],
         index: int,
     ) -> Chunk:
-        location = self._compute_location(chunk_content, full_content)
+        location = self._compute_location(lines, char_start, char_end)
         return Chunk(
             content=chunk_content,
             content_hash=self._compute_hash(chunk_content),
             location=location,
-            metadata={
-                **(metadata or {}),
+            metadata=MetadataOverlay(metadata, {
                 "chunk_index": index,
                 "chunk_size": len(chunk_content),
-            },
+            }),
         )
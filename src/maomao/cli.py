@@ -60,6 +60,9 @@ def ingest(
     table.add_row("新增", str(result.new_chunks))
     table.add_row("更新", str(result.updated_chunks))
     table.add_row("删除", str(result.deleted_chunks))
+    table.add_row("缓存命中", f"{result.cache_hits}/{result.cache_hits + result.cache_misses}")
+    if result.embed_concurrency:
+        table.add_row("嵌入并发", f"{result.embed_concurrency} × {result.embed_batch_size}")
     table.add_row("耗时", f"{result.duration_seconds:.2f}s")
 
     if result.errors:
@@ -73,6 +76,27 @@ def ingest(
             console.print(f"  - {error}")
 
 
+@app.command()
+def watch(
+    debounce: Annotated[
+        float | None, typer.Option("--debounce", "-d", help="合并文件事件的时间窗口（秒）")
+    ] = None,
+) -> None:
+    """监听本地文档变更并自动增量导入"""
+    from maomao.watcher import DocWatcher
+
+    settings = get_settings()
+    if debounce is None:
+        debounce = settings.incremental.watch_debounce_seconds
+    watcher = DocWatcher(IngestionPipeline(settings), debounce)
+
+    console.print("[cyan]开始监听文档变更，按 Ctrl+C 退出[/cyan]")
+    try:
+        asyncio.run(watcher.run())
+    except KeyboardInterrupt:
+        console.print("\n[yellow]已停止监听[/yellow]")
+
+
 @app.command()
 def search(
     query: Annotated[str, typer.Argument(help="搜索查询")],
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from maomao.config import OllamaConfig
+
+
+class AdaptiveLimiter:
+    """AIMD window over in-flight embedding requests and texts per request.
+
+    A response under ``target_latency`` widens the concurrency window by one
+    per window's worth of responses; if it carried a full batch it also
+    grows the batch by ``batch_increment``. An error or a slow response
+    multiplies both by ``backoff``, at most once per round trip, so that a
+    burst of requests that were all sent into the same overload only counts
+    once.
+    """
+
+    def __init__(
+        self,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        min_batch_size: int = 1,
+        max_batch_size: int = 64,
+        target_latency: float = 30.0,
+        batch_increment: int = 4,
+        backoff: float = 0.5,
+        adaptive: bool = True,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = min(max(1, min_concurrency), self.max_concurrency)
+        self.max_batch_size = max(1, max_batch_size)
+        self.min_batch_size = min(max(1, min_batch_size), self.max_batch_size)
+        self.target_latency = target_latency
+        self.batch_increment = batch_increment
+        self.backoff = backoff
+        self.adaptive = adaptive
+        self.requests = 0
+        self.errors = 0
+        self.backoffs = 0
+        self._concurrency = float(self.min_concurrency if adaptive else self.max_concurrency)
+        self._batch_size = float(self.max_batch_size)
+        self._in_flight = 0
+        self._backoff_at = 0.0
+        self._condition = asyncio.Condition()
+
+    @classmethod
+    def from_config(cls, config: OllamaConfig) -> "AdaptiveLimiter":
+        return cls(
+            min_concurrency=config.min_concurrency,
+            max_concurrency=config.max_concurrency,
+            min_batch_size=config.min_batch_size,
+            max_batch_size=config.batch_size,
+            target_latency=config.target_latency,
+            adaptive=config.adaptive_concurrency,
+        )
+
+    @property
+    def concurrency(self) -> int:
+        return int(self._concurrency)
+
+    @property
+    def batch_size(self) -> int:
+        return int(self._batch_size)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @asynccontextmanager
+    async def slot(self, size: int = 1) -> AsyncIterator[None]:
+        """Hold one in-flight request of ``size`` texts and feed back how it went."""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.concurrency)
+            self._in_flight += 1
+
+        started = time.monotonic()
+        outcome: bool | None = None
+        try:
+            yield
+            outcome = True
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            if outcome is not None:
+                self.record(started, time.monotonic() - started, outcome, size)
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def record(self, started: float, latency: float, ok: bool, size: int = 1) -> None:
+        self.requests += 1
+        if not ok:
+            self.errors += 1
+        if not self.adaptive:
+            return
+
+        if not ok or latency > self.target_latency:
+            if started >= self._backoff_at:
+                self._concurrency = max(self.min_concurrency, self._concurrency * self.backoff)
+                self._batch_size = max(self.min_batch_size, self._batch_size * self.backoff)
+                self._backoff_at = time.monotonic()
+                self.backoffs += 1
+            return
+
+        self._concurrency = min(self.max_concurrency, self._concurrency + 1 / self._concurrency)
+        if size >= self.batch_size:
+            self._batch_size = min(self.max_batch_size, self._batch_size + self.batch_increment)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "requests": self.requests,
+            "errors": self.errors,
+            "backoffs": self.backoffs,
+        }
@@ -19,6 +19,14 @@ class OllamaConfig(BaseModel):
     embedding_model: str = "bge-m3"
     embedding_dim: int = 1024
     timeout: int = 120
+    use_batch_api: bool = True
+    batch_size: int = 64
+    json_codec: Literal["auto", "json", "orjson"] = "auto"
+    adaptive_concurrency: bool = True
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    min_batch_size: int = 4
+    target_latency: float = 30.0
 
 
 class QdrantConfig(BaseModel):
@@ -32,12 +40,34 @@ class ChunkConfig(BaseModel):
     chunk_size: int = 512
     chunk_overlap: int = 50
     min_chunk_size: int = 50
+    size_unit: Literal["chars", "tokens"] = "chars"
+    tokenizer: str = ""
 
 
 class IncrementalConfig(BaseModel):
     enabled: bool = True
     state_file: str = ".maomao/state.json"
-    watch_debounce_seconds: float = 2.0
+    watch_debounce_seconds: float = 0.5
+
+
+class EmbeddingCacheConfig(BaseModel):
+    enabled: bool = True
+    path: str = ".maomao/embeddings.db"
+    max_entries: int = 1_000_000
+
+
+class ChunkCacheConfig(BaseModel):
+    enabled: bool = True
+    path: str = ".maomao/chunks.db"
+    max_entries: int = 200_000
+
+
+class PipelineConfig(BaseModel):
+    queue_size: int = 8
+    scan_concurrency: int = 1
+    chunk_concurrency: int = 2
+    embed_concurrency: int = 2
+    upsert_concurrency: int = 1
 
 
 class _SettingsModel(BaseModel):
@@ -46,6 +76,9 @@ class _SettingsModel(BaseModel):
     qdrant: QdrantConfig = Field(default_factory=QdrantConfig)
     chunk: ChunkConfig = Field(default_factory=ChunkConfig)
     incremental: IncrementalConfig = Field(default_factory=IncrementalConfig)
+    embedding_cache: EmbeddingCacheConfig = Field(default_factory=EmbeddingCacheConfig)
+    chunk_cache: ChunkCacheConfig = Field(default_factory=ChunkCacheConfig)
+    pipeline: PipelineConfig = Field(default_factory=PipelineConfig)
     log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
 
 
@@ -61,12 +94,23 @@ class Settings(BaseSettings):
     qdrant: QdrantConfig = Field(default_factory=QdrantConfig)
     chunk: ChunkConfig = Field(default_factory=ChunkConfig)
     incremental: IncrementalConfig = Field(default_factory=IncrementalConfig)
+    embedding_cache: EmbeddingCacheConfig = Field(default_factory=EmbeddingCacheConfig)
+    chunk_cache: ChunkCacheConfig = Field(default_factory=ChunkCacheConfig)
+    pipeline: PipelineConfig = Field(default_factory=PipelineConfig)
     log_level: Literal["DEBUG", "INFO", "WARNING", "ERROR"] = "INFO"
 
     @property
     def state_file_path(self) -> Path:
         return Path(self.incremental.state_file).expanduser().absolute()
 
+    @property
+    def embedding_cache_path(self) -> Path:
+        return Path(self.embedding_cache.path).expanduser().absolute()
+
+    @property
+    def chunk_cache_path(self) -> Path:
+        return Path(self.chunk_cache.path).expanduser().absolute()
+
     def get_enabled_sources(self) -> list[SourceConfig]:
         return [s for s in self.sources if s.enabled]
 
@@ -102,6 +146,12 @@ def get_settings() -> Settings:
                 env_settings.chunk = ChunkConfig(**data["chunk"])
             if "incremental" in data:
                 env_settings.incremental = IncrementalConfig(**data["incremental"])
+            if "embedding_cache" in data:
+                env_settings.embedding_cache = EmbeddingCacheConfig(**data["embedding_cache"])
+            if "chunk_cache" in data:
+                env_settings.chunk_cache = ChunkCacheConfig(**data["chunk_cache"])
+            if "pipeline" in data:
+                env_settings.pipeline = PipelineConfig(**data["pipeline"])
             if "log_level" in data:
                 env_settings.log_level = data["log_level"]
         except Exception:
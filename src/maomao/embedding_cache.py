@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+
+class EmbeddingCache:
+    _QUERY_BATCH = 500
+
+    def __init__(self, path: Path, model: str, dim: int, max_entries: int = 1_000_000):
+        self.path = path
+        self.model = model
+        self.dim = dim
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._clock = 0.0
+        self._entries: int | None = None
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (model, dim, content_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+            )
+        return self._conn
+
+    def get_many(self, content_hashes: list[str]) -> dict[str, np.ndarray]:
+        keys = list(dict.fromkeys(h for h in content_hashes if h))
+        with self._lock:
+            found = {h: self._decode(blob) for h, blob in self._select(keys, "vector")}
+            if found:
+                now = self._now()
+                self.conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND dim = ? AND content_hash = ?",
+                    [(now, self.model, self.dim, h) for h in found],
+                )
+                self.conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, content_hash: str) -> np.ndarray | None:
+        return self.get_many([content_hash]).get(content_hash)
+
+    def put_many(self, embeddings: dict[str, np.ndarray | list[float]]) -> None:
+        vectors = {}
+        for content_hash, vector in embeddings.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            if content_hash and vector.shape == (self.dim,) and vector.any():
+                vectors[content_hash] = vector.tobytes()
+        if not vectors:
+            return
+
+        with self._lock:
+            now = self._now()
+            rows = [(self.model, self.dim, h, blob, now) for h, blob in vectors.items()]
+            entries = self._entry_count()
+            existing = {h for h, _ in self._select(list(vectors), "1")}
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(model, dim, content_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._entries = entries + len(vectors.keys() - existing)
+            self._evict()
+            self.conn.commit()
+
+    def put(self, content_hash: str, vector: np.ndarray | list[float]) -> None:
+        self.put_many({content_hash: vector})
+
+    def count(self) -> int:
+        with self._lock:
+            return self._entry_count()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self.count()}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+                self._entries = None
+
+    def _select(self, keys: list[str], column: str) -> list[tuple[str, Any]]:
+        rows: list[tuple[str, Any]] = []
+        for i in range(0, len(keys), self._QUERY_BATCH):
+            batch = keys[i : i + self._QUERY_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows.extend(
+                self.conn.execute(
+                    f"SELECT content_hash, {column} FROM embeddings "
+                    f"WHERE model = ? AND dim = ? AND content_hash IN ({placeholders})",
+                    (self.model, self.dim, *batch),
+                ).fetchall()
+            )
+        return rows
+
+    def _entry_count(self) -> int:
+        if self._entries is None:
+            self._entries = int(self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+        return self._entries
+
+    def _evict(self) -> None:
+        excess = self._entry_count() - self.max_entries
+        if excess <= 0:
+            return
+        cursor = self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN ("
+            "SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self._entries = self._entry_count() - cursor.rowcount
+
+    def _now(self) -> float:
+        self._clock = max(time.time(), self._clock + 1e-6)
+        return self._clock
+
+    def _decode(self, blob: bytes) -> np.ndarray:
+        return np.frombuffer(blob, dtype=np.float32)
@@ -1,67 +1,209 @@
 import asyncio
+import json
 from abc import ABC, abstractmethod
+from typing import Any
 
 import httpx
+import numpy as np
 from rich.console import Console
 
+from maomao.concurrency import AdaptiveLimiter
 from maomao.config import OllamaConfig
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 console = Console()
 
 
+class EmbeddingCodec(ABC):
+    """Decodes embedding API response bodies into float32 arrays."""
+
+    name: str = ""
+
+    @abstractmethod
+    def loads(self, content: bytes) -> Any:
+        pass
+
+    def decode(self, content: bytes, key: str) -> np.ndarray:
+        """Return the vector(s) under ``key`` as float32; empty if absent."""
+        return np.asarray(self.loads(content).get(key) or [], dtype=np.float32)
+
+
+class JsonCodec(EmbeddingCodec):
+    name = "json"
+
+    def loads(self, content: bytes) -> Any:
+        return json.loads(content)
+
+
+class OrjsonCodec(EmbeddingCodec):
+    name = "orjson"
+
+    def loads(self, content: bytes) -> Any:
+        return orjson.loads(content)
+
+
+def get_codec(name: str = "auto") -> EmbeddingCodec:
+    if name == "json":
+        return JsonCodec()
+    if HAS_ORJSON:
+        return OrjsonCodec()
+    if name == "orjson":
+        console.print(
+            "[yellow]orjson not installed, decoding embeddings with json "
+            "(pip install luckypeak-maomao[fast-json])[/yellow]"
+        )
+    return JsonCodec()
+
+
+class EmbeddingError(Exception):
+    """Some texts could not be embedded.
+
+    ``embeddings`` still holds one row per text; rows set in the boolean
+    ``failed`` mask are placeholders and must not be stored.
+    """
+
+    def __init__(self, message: str, embeddings: np.ndarray, failed: np.ndarray):
+        super().__init__(message)
+        self.embeddings = embeddings
+        self.failed = failed
+
+
 class EmbeddingService(ABC):
+    limiter: AdaptiveLimiter | None = None
+
     @abstractmethod
-    async def embed(self, texts: list[str]) -> list[list[float]]:
+    async def embed(self, texts: list[str]) -> np.ndarray | list[list[float]]:
+        """Embed ``texts``, one row per text.
+
+        Implementations should return a contiguous ``(len(texts), dim)``
+        float32 array so callers can hand out row views instead of lists,
+        and raise ``EmbeddingError`` when only some texts were embedded.
+        """
+
+    @abstractmethod
+    async def embed_single(self, text: str) -> np.ndarray | list[float]:
         pass
 
     @abstractmethod
-    async def embed_single(self, text: str) -> list[float]:
+    async def close(self) -> None:
         pass
 
 
 class OllamaEmbeddingService(EmbeddingService):
-    def __init__(self, config: OllamaConfig):
+    limiter: AdaptiveLimiter
+    batch_retries: int = 3
+    retry_delay: float = 1.0
+
+    def __init__(self, config: OllamaConfig, codec: EmbeddingCodec | None = None):
         self.config = config
+        self.codec = codec or get_codec(config.json_codec)
+        self.limiter = AdaptiveLimiter.from_config(config)
         self.client = httpx.AsyncClient(
             base_url=config.base_url,
             timeout=config.timeout,
             trust_env=False,
         )
+        self._batch_api_supported = config.use_batch_api
 
-    async def embed(self, texts: list[str]) -> list[list[float]]:
+    async def embed(self, texts: list[str]) -> np.ndarray:
         if not texts:
-            return []
+            return np.empty((0, self.config.embedding_dim), dtype=np.float32)
+
+        batch_size = self.limiter.batch_size
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        groups = await asyncio.gather(*(self._embed_group(batch) for batch in batches))
+        embeddings = groups[0] if len(groups) == 1 else np.concatenate(groups)
+
+        failed = np.isnan(embeddings).any(axis=1)
+        if failed.any():
+            raise EmbeddingError(
+                f"Failed to embed {int(failed.sum())} of {len(texts)} texts",
+                embeddings,
+                failed,
+            )
+        return embeddings
 
-        embeddings: list[list[float]] = []
-        batch_size = 10
+    def _failed_rows(self, count: int) -> np.ndarray:
+        # NaN rows mark texts that could not be embedded until embed() reports them.
+        return np.full((count, self.config.embedding_dim), np.nan, dtype=np.float32)
 
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i : i + batch_size]
-            tasks = [self._embed_one(text) for text in batch]
-            batch_embeddings = await asyncio.gather(*tasks)
-            embeddings.extend(batch_embeddings)
+    async def _embed_group(self, texts: list[str], attempt: int = 0) -> np.ndarray:
+        if not self._batch_api_supported:
+            return np.stack(await self._embed_each(texts))
 
+        try:
+            embeddings = await self._embed_batch(texts)
+        except Exception as e:
+            if attempt >= self.batch_retries:
+                console.print(f"[red]Batch embedding error: {e}[/red]")
+                return self._failed_rows(len(texts))
+            # The limiter has already backed off; retry at its new batch size.
+            await asyncio.sleep(self.retry_delay * 2**attempt)
+            size = self.limiter.batch_size
+            parts = [texts[i : i + size] for i in range(0, len(texts), size)]
+            results = await asyncio.gather(*(self._embed_group(p, attempt + 1) for p in parts))
+            return np.concatenate(results)
+
+        if embeddings is None:
+            return np.stack(await self._embed_each(texts))
         return embeddings
 
-    async def _embed_one(self, text: str) -> list[float]:
-        try:
+    async def _embed_batch(self, texts: list[str]) -> np.ndarray | None:
+        """Embed ``texts`` in one request; None if the server lacks /api/embed."""
+        async with self.limiter.slot(len(texts)):
             response = await self.client.post(
-                "/api/embeddings",
+                "/api/embed",
                 json={
                     "model": self.config.embedding_model,
-                    "prompt": text,
+                    "input": texts,
                 },
             )
+            if response.status_code == 404 and "model" not in response.text:
+                self._batch_api_supported = False
+                console.print(
+                    "[yellow]Ollama /api/embed not available, "
+                    "falling back to /api/embeddings[/yellow]"
+                )
+                return None
             response.raise_for_status()
-            data = response.json()
-            return data.get("embedding", [])
+            embeddings = self.codec.decode(response.content, "embeddings")
+            if len(embeddings) != len(texts):
+                raise ValueError(f"expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    async def _embed_each(self, texts: list[str]) -> list[np.ndarray]:
+        return list(await asyncio.gather(*(self._embed_one(text) for text in texts)))
+
+    async def _embed_one(self, text: str) -> np.ndarray:
+        try:
+            async with self.limiter.slot():
+                response = await self.client.post(
+                    "/api/embeddings",
+                    json={
+                        "model": self.config.embedding_model,
+                        "prompt": text,
+                    },
+                )
+                response.raise_for_status()
+            embedding = self.codec.decode(response.content, "embedding")
+            if embedding.size == 0:
+                return self._failed_rows(1).reshape(-1)
+            return embedding
         except Exception as e:
             console.print(f"[red]Embedding error: {e}[/red]")
-            return [0.0] * self.config.embedding_dim
+            return self._failed_rows(1).reshape(-1)
 
-    async def embed_single(self, text: str) -> list[float]:
-        result = await self._embed_one(text)
-        return result
+    async def embed_single(self, text: str) -> np.ndarray:
+        embedding = await self._embed_one(text)
+        if np.isnan(embedding).any():
+            return np.zeros(self.config.embedding_dim, dtype=np.float32)
+        return embedding
 
     async def close(self) -> None:
         await self.client.aclose()
@@ -0,0 +1,41 @@
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class _LazySlot:
+    """Wraps a slot member so an unset (``None``) value is built on first read."""
+
+    __slots__ = ("slot", "factory")
+
+    def __init__(self, slot: Any, factory: Callable[[Any], Any]):
+        self.slot = slot
+        self.factory = factory
+
+    def __get__(self, instance: Any, owner: type | None = None) -> Any:
+        if instance is None:
+            return self
+        value = self.slot.__get__(instance, owner)
+        if value is None:
+            value = self.factory(instance)
+            self.slot.__set__(instance, value)
+        return value
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        self.slot.__set__(instance, value)
+
+
+def lazy_defaults(**factories: Callable[[Any], Any]) -> Callable[[type[T]], type[T]]:
+    """Fill the named ``None``-defaulted fields of a slots dataclass lazily.
+
+    Apply above ``@dataclass(slots=True)``. Each factory receives the
+    instance, so a default may derive from another field.
+    """
+
+    def decorate(cls: type[T]) -> type[T]:
+        for name, factory in factories.items():
+            setattr(cls, name, _LazySlot(cls.__dict__[name], factory))
+        return cls
+
+    return decorate
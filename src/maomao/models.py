@@ -1,9 +1,41 @@
 from datetime import datetime
 from enum import StrEnum
-from typing import Any
-from uuid import uuid4
+from typing import Annotated, Any
+from uuid import UUID, uuid4, uuid5
 
-from pydantic import BaseModel, Field
+import numpy as np
+from pydantic import BaseModel, Field, PlainSerializer, PlainValidator, WithJsonSchema
+
+CHUNK_ID_NAMESPACE = UUID("6f1c3e0a-4d2b-5a8e-9c7f-3b6d1e2a4c58")
+
+
+def make_chunk_id(
+    source_type: str,
+    source_id: str,
+    content_hash: str,
+    occurrence: int = 0,
+    knowledge_scope: str = "global",
+    project_id: str = "",
+) -> str:
+    name = f"{source_type}:{knowledge_scope}:{project_id}:{source_id}:{content_hash}:{occurrence}"
+    return str(uuid5(CHUNK_ID_NAMESPACE, name))
+
+
+def _as_vector(value: Any) -> np.ndarray:
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.ndim != 1:
+        raise ValueError(f"expected a 1-D vector, got shape {vector.shape}")
+    return vector
+
+
+# Embeddings are float32 row views into the batch the embedding service
+# returned; they only become lists of floats when serialized.
+Vector = Annotated[
+    np.ndarray,
+    PlainValidator(_as_vector),
+    PlainSerializer(lambda vector: vector.tolist(), return_type=list[float]),
+    WithJsonSchema({"type": "array", "items": {"type": "number"}}),
+]
 
 
 class SourceType(StrEnum):
@@ -35,7 +67,7 @@ class KnowledgeChunk(BaseModel):
     created_at: datetime = Field(default_factory=datetime.now)
     updated_at: datetime = Field(default_factory=datetime.now)
     content_hash: str = ""
-    embedding: list[float] | None = None
+    embedding: Vector | None = None
     location: ChunkLocation | None = None
 
 
@@ -51,6 +83,10 @@ class IngestResult(BaseModel):
     new_chunks: int = 0
     updated_chunks: int = 0
     deleted_chunks: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    embed_concurrency: int = 0
+    embed_batch_size: int = 0
     errors: list[str] = Field(default_factory=list)
     duration_seconds: float = 0.0
 
@@ -1,14 +1,28 @@
+import asyncio
+import hashlib
 import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from datetime import datetime
 from typing import Any
 
+import numpy as np
 from rich.console import Console
 
-from maomao.chunkers import Chunk, ChunkerRegistry, ChunkLocation
+from maomao.chunk_cache import ChunkCache, chunker_fingerprint
+from maomao.chunkers import (
+    Chunk,
+    Chunker,
+    ChunkerRegistry,
+    ChunkLocation,
+    CodeChunker,
+    MetadataOverlay,
+)
 from maomao.config import Settings, get_settings
-from maomao.embeddings import EmbeddingService, get_embedding_service
+from maomao.embedding_cache import EmbeddingCache
+from maomao.embeddings import EmbeddingError, EmbeddingService, get_embedding_service
 from maomao.models import ChunkLocation as ModelChunkLocation
-from maomao.models import IngestResult, KnowledgeChunk
-from maomao.sources import KnowledgeSource, SourceItem, SourceRegistry
+from maomao.models import IngestResult, KnowledgeChunk, make_chunk_id
+from maomao.sources import KnowledgeSource, SourceChange, SourceItem, SourceRegistry
 from maomao.state import StateManager
 from maomao.vectorstore import VectorStore
 
@@ -21,8 +35,33 @@ class IngestionPipeline:
         self.embedding_service: EmbeddingService | None = None
         self.vector_store: VectorStore | None = None
         self.state_manager: StateManager | None = None
+        self.embedding_cache: EmbeddingCache | None = None
+        self.chunk_cache: ChunkCache | None = None
         self._sources: list[KnowledgeSource] = []
-        self._chunker_cache: dict[str, Any] = {}
+        self._chunker_cache: dict[str, Chunker | None] = {}
+        self._chunker_configs: dict[str, dict[str, Any]] = {}
+
+    @property
+    def sources(self) -> list[KnowledgeSource]:
+        return self._sources
+
+    @property
+    def _embedder(self) -> EmbeddingService:
+        if self.embedding_service is None:
+            raise RuntimeError("Pipeline is not initialized")
+        return self.embedding_service
+
+    @property
+    def _store(self) -> VectorStore:
+        if self.vector_store is None:
+            raise RuntimeError("Pipeline is not initialized")
+        return self.vector_store
+
+    @property
+    def _state(self) -> StateManager:
+        if self.state_manager is None:
+            raise RuntimeError("Pipeline is not initialized")
+        return self.state_manager
 
     async def initialize(self) -> None:
         self.embedding_service = await get_embedding_service(self.settings.ollama)
@@ -32,7 +71,21 @@ class IngestionPipeline:
         )
         self.vector_store.ensure_collection()
         self.state_manager = StateManager(self.settings.state_file_path)
+        if self.settings.embedding_cache.enabled and self.embedding_cache is None:
+            self.embedding_cache = EmbeddingCache(
+                self.settings.embedding_cache_path,
+                self.settings.ollama.embedding_model,
+                self.settings.ollama.embedding_dim,
+                self.settings.embedding_cache.max_entries,
+            )
+        if self.settings.chunk_cache.enabled and self.chunk_cache is None:
+            self.chunk_cache = ChunkCache(
+                self.settings.chunk_cache_path,
+                self.settings.chunk_cache.max_entries,
+            )
 
+        for stale in self._sources:
+            await stale.close()
         self._sources = []
         for source_config in self.settings.get_enabled_sources():
             source = SourceRegistry.create(
@@ -51,22 +104,38 @@ class IngestionPipeline:
             await source.close()
         if self.embedding_service:
             await self.embedding_service.close()
-
-    def _get_chunker(self, chunker_type: str):
+        if self.embedding_cache:
+            self.embedding_cache.close()
+            self.embedding_cache = None
+        if self.chunk_cache:
+            self.chunk_cache.close()
+            self.chunk_cache = None
+
+    def _get_chunker(self, chunker_type: str) -> Chunker | None:
         if chunker_type not in self._chunker_cache:
-            chunker_config = {}
+            chunker_config: dict[str, Any] = {}
             if chunker_type == "markdown":
                 chunker_config = {
                     "max_chunk_size": self.settings.chunk.chunk_size * 2,
                     "min_chunk_size": self.settings.chunk.min_chunk_size,
+                    "size_unit": self.settings.chunk.size_unit,
+                    "tokenizer": self.settings.chunk.tokenizer,
+                }
+            elif chunker_type == "code":
+                chunker_config = {
+                    "max_chunk_size": self.settings.chunk.chunk_size * 3,
+                    "min_chunk_size": self.settings.chunk.min_chunk_size,
                 }
             elif chunker_type == "text":
                 chunker_config = {
                     "chunk_size": self.settings.chunk.chunk_size,
                     "chunk_overlap": self.settings.chunk.chunk_overlap,
                     "min_chunk_size": self.settings.chunk.min_chunk_size,
+                    "size_unit": self.settings.chunk.size_unit,
+                    "tokenizer": self.settings.chunk.tokenizer,
                 }
             self._chunker_cache[chunker_type] = ChunkerRegistry.create(chunker_type, chunker_config)
+            self._chunker_configs[chunker_type] = chunker_config
         return self._chunker_cache.get(chunker_type)
 
     async def run_full_ingest(self) -> IngestResult:
@@ -74,38 +143,49 @@ class IngestionPipeline:
         result = IngestResult()
 
         await self.initialize()
+        cache_stats = self._cache_counters()
 
         try:
-            all_chunks: list[KnowledgeChunk] = []
-
-            for source in self._sources:
-                console.print(f"[cyan]Scanning source: {source.source_type()}...[/cyan]")
-                items = await source.scan()
-                console.print(f"  Found {len(items)} items")
-
-                for item in items:
-                    chunks = self._item_to_chunks(item)
-                    all_chunks.extend(chunks)
-
-                source_state = self._build_source_state(items)
-                self.state_manager.update_source_state(source.source_type(), source_state)
-
-            result.total_chunks = len(all_chunks)
-
-            if all_chunks:
-                console.print(f"[cyan]Generating embeddings for {len(all_chunks)} chunks...[/cyan]")
-                await self._embed_chunks(all_chunks)
-
-                console.print("[cyan]Storing in vector database...[/cyan]")
-                self.vector_store.upsert_chunks(all_chunks)
-                result.new_chunks = len(all_chunks)
-
-            self.state_manager.mark_full_ingest()
+            previous = [self._previous_manifests(self.source_state(s)) for s in self._sources]
+            scanned: list[dict[str, dict[str, Any]]] = [{} for _ in self._sources]
+            manifests: list[dict[str, list[str]]] = [{} for _ in self._sources]
+            feeds = [
+                (self._scan_source(source, entries), source_manifests)
+                for source, entries, source_manifests in zip(
+                    self._sources, scanned, manifests, strict=True
+                )
+            ]
+            # Items indexed before chunk IDs were deterministic have no
+            # manifest; their old points are cleared by source ID before the
+            # new ones are upserted, since clearing afterwards would take
+            # the new points too.
+            untracked: dict[str, list[str] | None] = {
+                source_id: None
+                for source_manifests in previous
+                for source_id, ids in source_manifests.items()
+                if ids is None
+            }
+            failed = await self._run_stages(feeds, result, untracked)
+
+            for source, entries, source_manifests, previous_manifests in zip(
+                self._sources, scanned, manifests, previous, strict=True
+            ):
+                result.deleted_chunks += await self._delete_stale_chunks(
+                    previous_manifests, entries, source_manifests
+                )
+                self._mark_for_retry(entries, failed)
+                self._save_source_state(
+                    source, self._build_source_state(entries, source_manifests)
+                )
+
+            self._state.mark_full_ingest()
 
         except Exception as e:
             result.errors.append(str(e))
             console.print(f"[red]Error during ingestion: {e}[/red]")
 
+        self._record_cache_stats(result, cache_stats)
+        self._record_embed_window(result)
         result.duration_seconds = time.time() - start_time
         console.print(f"[green]Ingestion completed in {result.duration_seconds:.2f}s[/green]")
 
@@ -119,109 +199,439 @@ class IngestionPipeline:
             return await self.run_full_ingest()
 
         await self.initialize()
+        cache_stats = self._cache_counters()
 
         try:
             for source in self._sources:
                 console.print(f"[cyan]Checking changes in: {source.source_type()}...[/cyan]")
 
-                previous_state = self.state_manager.get_source_state(source.source_type())
+                previous_state = self.source_state(source)
                 changes = await source.get_changes(previous_state)
+                await self._apply_changes(source, changes, result)
 
-                added_chunks: list[KnowledgeChunk] = []
-                for item in changes.added:
-                    chunks = self._item_to_chunks(item)
-                    added_chunks.extend(chunks)
-
-                updated_chunks: list[KnowledgeChunk] = []
-                for item in changes.updated:
-                    chunks = self._item_to_chunks(item)
-                    updated_chunks.extend(chunks)
-
-                if changes.deleted_ids:
-                    self.vector_store.delete_by_source_ids(changes.deleted_ids)
-                    result.deleted_chunks += len(changes.deleted_ids)
+            self._state.save_state()
 
-                if added_chunks:
-                    await self._embed_chunks(added_chunks)
-                    self.vector_store.upsert_chunks(added_chunks)
-                    result.new_chunks += len(added_chunks)
-
-                if updated_chunks:
-                    await self._embed_chunks(updated_chunks)
-                    self.vector_store.upsert_chunks(updated_chunks)
-                    result.updated_chunks += len(updated_chunks)
-
-                result.total_chunks += len(added_chunks) + len(updated_chunks)
+        except Exception as e:
+            result.errors.append(str(e))
 
-                items = await source.scan()
-                new_state = self._build_source_state(items)
-                self.state_manager.update_source_state(source.source_type(), new_state)
+        self._record_cache_stats(result, cache_stats)
+        self._record_embed_window(result)
+        result.duration_seconds = time.time() - start_time
+        return result
 
-            self.state_manager.save_state()
+    async def ingest_changes(self, source: KnowledgeSource, changes: SourceChange) -> IngestResult:
+        start_time = time.time()
+        result = IngestResult()
+        cache_stats = self._cache_counters()
 
+        try:
+            await self._apply_changes(source, changes, result)
+            self._state.save_state()
         except Exception as e:
             result.errors.append(str(e))
 
+        self._record_cache_stats(result, cache_stats)
+        self._record_embed_window(result)
         result.duration_seconds = time.time() - start_time
         return result
 
+    async def _apply_changes(
+        self, source: KnowledgeSource, changes: SourceChange, result: IngestResult
+    ) -> None:
+        previous_state = self.source_state(source)
+        previous_manifests = self._previous_manifests(previous_state)
+
+        if changes.deleted_ids:
+            result.deleted_chunks += await self._delete_items(
+                changes.deleted_ids, previous_manifests
+            )
+
+        # Entries written before manifests existed stay without one, so the
+        # next update to them still clears their old points by source ID.
+        manifests = {
+            source_id: ids for source_id, ids in previous_manifests.items() if ids is not None
+        }
+        known = {
+            item.source_id: previous_manifests.get(item.source_id) for item in changes.updated
+        }
+        failed = await self._run_stages(
+            [(self._iter_items(changes.added + changes.updated), manifests)], result, known
+        )
+
+        entries = {
+            source_id: {k: v for k, v in info.items() if k != "chunks"}
+            for source_id, info in previous_state.get("files", {}).items()
+        }
+        for source_id in changes.deleted_ids:
+            entries.pop(source_id, None)
+        for source_id, item_state in changes.refreshed.items():
+            if source_id in entries:
+                entries[source_id].update(item_state)
+        for item in changes.added + changes.updated:
+            entries[item.source_id] = self._state_entry(item)
+        self._mark_for_retry(entries, failed)
+
+        new_state = {**changes.checkpoint, **self._build_source_state(entries, manifests)}
+        self._save_source_state(source, new_state)
+
+    def source_state(self, source: KnowledgeSource) -> dict[str, Any]:
+        """Return the state recorded for ``source`` by the previous ingest.
+
+        State used to be keyed by source type alone. Such an entry is taken
+        over only when ``source`` is the one configured source of its type;
+        otherwise it cannot be attributed and the source starts fresh.
+        """
+        state = self._state.get_source_state(source.state_key())
+        if not state and self._owns_legacy_state(source):
+            state = self._state.get_source_state(source.source_type())
+        return state
+
+    def _save_source_state(self, source: KnowledgeSource, state: dict[str, Any]) -> None:
+        self._state.update_source_state(source.state_key(), state)
+        if self._owns_legacy_state(source):
+            self._state.remove_source_state(source.source_type())
+
+    def _owns_legacy_state(self, source: KnowledgeSource) -> bool:
+        same_type = [s for s in self._sources if s.source_type() == source.source_type()]
+        return same_type == [source] and source.state_key() != source.source_type()
+
+    def _cache_counters(self) -> tuple[int, int]:
+        if not self.embedding_cache:
+            return 0, 0
+        return self.embedding_cache.hits, self.embedding_cache.misses
+
+    def _record_cache_stats(self, result: IngestResult, start: tuple[int, int]) -> None:
+        hits, misses = self._cache_counters()
+        result.cache_hits = hits - start[0]
+        result.cache_misses = misses - start[1]
+
+    def _record_embed_window(self, result: IngestResult) -> None:
+        limiter = self.embedding_service.limiter if self.embedding_service else None
+        if limiter is None:
+            return
+        result.embed_concurrency = limiter.concurrency
+        result.embed_batch_size = limiter.batch_size
+
     def _item_to_chunks(self, item: SourceItem) -> list[KnowledgeChunk]:
-        chunker = self._get_chunker(item.chunker_type)
+        chunker_type = item.chunker_type
+        chunker = self._get_chunker(chunker_type)
         if not chunker:
             console.print(f"[yellow]Unknown chunker type: {item.chunker_type}, using text[/yellow]")
-            chunker = self._get_chunker("text")
+            chunker_type = "text"
+            chunker = self._get_chunker(chunker_type)
 
         if not chunker:
             return []
 
-        raw_chunks: list[Chunk] = chunker.chunk(item.content, item.metadata)
-
-        return [
-            KnowledgeChunk(
-                content=chunk.content,
-                source_type=item.source_type,
-                source_path=item.source_path,
-                source_id=item.source_id,
-                knowledge_scope=item.knowledge_scope,
-                project_id=item.project_id,
-                metadata=chunk.metadata,
-                content_hash=chunk.content_hash,
-                location=self._convert_location(chunk.location),
+        raw_chunks = self._chunk_item(item, chunker_type, chunker)
+
+        chunks: list[KnowledgeChunk] = []
+        occurrences: dict[str, int] = {}
+        now = datetime.now()
+        for chunk in raw_chunks:
+            occurrence = occurrences.get(chunk.content_hash, 0)
+            occurrences[chunk.content_hash] = occurrence + 1
+            metadata = chunk.metadata
+            # Chunker output is already well typed; every field is passed so
+            # model_construct never falls back to the default factories.
+            chunks.append(
+                KnowledgeChunk.model_construct(
+                    id=make_chunk_id(
+                        item.source_type,
+                        item.source_id,
+                        chunk.content_hash,
+                        occurrence,
+                        item.knowledge_scope,
+                        item.project_id,
+                    ),
+                    content=chunk.content,
+                    source_type=item.source_type,
+                    source_path=item.source_path,
+                    source_id=item.source_id,
+                    knowledge_scope=item.knowledge_scope,
+                    project_id=item.project_id,
+                    metadata=metadata.to_dict()
+                    if isinstance(metadata, MetadataOverlay)
+                    else dict(metadata),
+                    created_at=now,
+                    updated_at=now,
+                    content_hash=chunk.content_hash,
+                    embedding=None,
+                    location=self._convert_location(chunk.location),
+                )
             )
-            for chunk in raw_chunks
-        ]
+        return chunks
 
     def _convert_location(self, location: ChunkLocation | None) -> ModelChunkLocation | None:
         if location is None:
             return None
-        return ModelChunkLocation(
+        return ModelChunkLocation.model_construct(
             start_line=location.start_line,
             end_line=location.end_line,
             char_start=location.char_start,
             char_end=location.char_end,
         )
 
-    def _build_source_state(self, items: list[SourceItem]) -> dict[str, Any]:
+    def _chunk_item(self, item: SourceItem, chunker_type: str, chunker: Chunker) -> list[Chunk]:
+        fingerprint = ""
+        if self.chunk_cache and item.content_hash:
+            fingerprint = chunker_fingerprint(
+                chunker_type,
+                self._chunker_configs.get(chunker_type, {}),
+                {key: item.metadata.get(key) for key in chunker.metadata_inputs},
+            )
+            cached = self.chunk_cache.get(
+                item.content_hash, chunker_type, fingerprint, item.content, item.metadata
+            )
+            if cached is not None:
+                return cached
+
+        raw_chunks = chunker.chunk(item.content, item.metadata, source_id=item.source_id)
+
+        if self.chunk_cache and fingerprint:
+            self.chunk_cache.put(
+                item.content_hash, chunker_type, fingerprint, item.content, item.metadata, raw_chunks
+            )
+        return raw_chunks
+
+    def _state_entry(self, item: SourceItem) -> dict[str, Any]:
+        return {**item.state, "hash": item.content_hash}
+
+    def _mark_for_retry(self, entries: dict[str, dict[str, Any]], source_ids: set[str]) -> None:
+        # Without a hash or stat fingerprint the item reads as changed next
+        # run, and its unembedded chunks are missing from its manifest.
+        for source_id in source_ids & entries.keys():
+            entries[source_id] = {}
+
+    def _build_source_state(
+        self, entries: dict[str, dict[str, Any]], manifests: dict[str, list[str]]
+    ) -> dict[str, Any]:
+        return {
+            "ids": list(entries),
+            "hashes": {source_id: entry.get("hash", "") for source_id, entry in entries.items()},
+            "count": len(entries),
+            "files": {
+                source_id: {**entry, "chunks": manifests[source_id]}
+                if source_id in manifests
+                else entry
+                for source_id, entry in entries.items()
+            },
+        }
+
+    def _previous_manifests(self, state: dict[str, Any]) -> dict[str, list[str] | None]:
         return {
-            "ids": [item.source_id for item in items],
-            "hashes": {item.source_id: item.content_hash for item in items},
-            "count": len(items),
-            "files": {item.source_id: {"hash": item.content_hash} for item in items},
+            source_id: info.get("chunks")
+            for source_id, info in state.get("files", {}).items()
         }
 
-    async def _embed_chunks(self, chunks: list[KnowledgeChunk]) -> None:
+    async def _scan_source(
+        self, source: KnowledgeSource, entries: dict[str, dict[str, Any]]
+    ) -> AsyncIterator[SourceItem]:
+        console.print(f"[cyan]Scanning source: {source.source_type()}...[/cyan]")
+        async for item in source.iter_items():
+            entries[item.source_id] = self._state_entry(item)
+            yield item
+        console.print(f"  Found {len(entries)} items in {source.source_type()}")
+
+    async def _iter_items(self, items: list[SourceItem]) -> AsyncIterator[SourceItem]:
+        for item in items:
+            yield item
+
+    async def _delete_items(
+        self, source_ids: list[str], manifests: dict[str, list[str] | None]
+    ) -> int:
+        chunk_ids = [i for source_id in source_ids for i in manifests.get(source_id) or []]
+        untracked = [source_id for source_id in source_ids if manifests.get(source_id) is None]
+
+        code_chunker = self._chunker_cache.get("code")
+        if isinstance(code_chunker, CodeChunker):
+            for source_id in source_ids:
+                code_chunker.forget(source_id)
+
+        deleted = 0
+        if chunk_ids:
+            await asyncio.to_thread(self._store.delete_chunks, chunk_ids)
+            deleted += len(chunk_ids)
+        if untracked:
+            deleted += await asyncio.to_thread(self._store.delete_by_source_ids, untracked)
+        return deleted
+
+    async def _delete_stale_chunks(
+        self,
+        previous: dict[str, list[str] | None],
+        entries: dict[str, dict[str, Any]],
+        manifests: dict[str, list[str]],
+    ) -> int:
+        deleted = await self._delete_items(
+            [source_id for source_id in previous if source_id not in entries], previous
+        )
+
+        stale: list[str] = []
+        for source_id, ids in previous.items():
+            if source_id in entries and ids:
+                current = set(manifests.get(source_id, []))
+                stale.extend(i for i in ids if i not in current)
+        if stale:
+            await asyncio.to_thread(self._store.delete_chunks, stale)
+            deleted += len(stale)
+        return deleted
+
+    async def _diff_chunks(
+        self,
+        item: SourceItem,
+        chunks: list[KnowledgeChunk],
+        known: list[str] | None,
+        result: IngestResult,
+    ) -> list[KnowledgeChunk]:
+        if known is None:
+            # Await before reading the counter: chunk workers run concurrently.
+            deleted = await asyncio.to_thread(self._store.delete_by_source_ids, [item.source_id])
+            result.deleted_chunks += deleted
+            result.updated_chunks += len(chunks)
+            return chunks
+
+        known_ids = set(known)
+        current_ids = {c.id for c in chunks}
+        fresh = [c for c in chunks if c.id not in known_ids]
+        kept = [c for c in chunks if c.id in known_ids]
+        stale = [i for i in known if i not in current_ids]
+
+        if stale:
+            await asyncio.to_thread(self._store.delete_chunks, stale)
+            result.deleted_chunks += len(stale)
+        if kept:
+            await asyncio.to_thread(self._store.update_payloads, kept)
+
+        result.updated_chunks += len(fresh)
+        return fresh
+
+    async def _run_stages(
+        self,
+        feeds: list[tuple[AsyncIterator[SourceItem], dict[str, list[str]]]],
+        result: IngestResult,
+        known: dict[str, list[str] | None] | None = None,
+    ) -> set[str]:
+        """Stream ``feeds`` through chunk, embed and upsert stages.
+
+        Each feed comes with the manifest dict its items' chunk IDs are
+        recorded in, so sources never overwrite each other's manifests.
+        Chunks that could not be embedded are not upserted and are left out
+        of the manifests; the source IDs they belong to are returned.
+        """
+        config = self.settings.pipeline
+        batch_size = max(1, self.settings.ollama.batch_size)
+        scan_workers = max(1, config.scan_concurrency)
+        chunk_workers = max(1, config.chunk_concurrency)
+        embed_workers = max(1, config.embed_concurrency)
+        upsert_workers = max(1, config.upsert_concurrency)
+
+        item_queue: asyncio.Queue[tuple[SourceItem, dict[str, list[str]]] | None] = (
+            asyncio.Queue(config.queue_size)
+        )
+        embed_queue: asyncio.Queue[list[KnowledgeChunk] | None] = asyncio.Queue(config.queue_size)
+        upsert_queue: asyncio.Queue[list[KnowledgeChunk] | None] = asyncio.Queue(config.queue_size)
+        pending_feeds = iter(feeds)
+        failed: dict[str, str] = {}
+
+        async def scan() -> None:
+            for feed, manifests in pending_feeds:
+                async for item in feed:
+                    await item_queue.put((item, manifests))
+
+        async def chunk() -> None:
+            batch: list[KnowledgeChunk] = []
+            while (entry := await item_queue.get()) is not None:
+                item, manifests = entry
+                chunks = await asyncio.to_thread(self._item_to_chunks, item)
+                result.total_chunks += len(chunks)
+                manifests[item.source_id] = [c.id for c in chunks]
+                if known is not None and item.source_id in known:
+                    chunks = await self._diff_chunks(item, chunks, known[item.source_id], result)
+                else:
+                    result.new_chunks += len(chunks)
+                batch.extend(chunks)
+                while len(batch) >= batch_size:
+                    await embed_queue.put(batch[:batch_size])
+                    batch = batch[batch_size:]
+            if batch:
+                await embed_queue.put(batch)
+
+        async def embed() -> None:
+            while (batch := await embed_queue.get()) is not None:
+                await self._embed_chunks(batch, result)
+                embedded = [c for c in batch if c.embedding is not None]
+                failed.update((c.id, c.source_id) for c in batch if c.embedding is None)
+                if embedded:
+                    await upsert_queue.put(embedded)
+
+        async def upsert() -> None:
+            while (batch := await upsert_queue.get()) is not None:
+                await asyncio.to_thread(self._store.upsert_chunks, batch)
+
+        async def stage(
+            worker: Callable[[], Awaitable[None]],
+            workers: int,
+            downstream: asyncio.Queue[Any] | None,
+            downstream_workers: int,
+        ) -> None:
+            await asyncio.gather(*(worker() for _ in range(workers)))
+            if downstream is not None:
+                for _ in range(downstream_workers):
+                    await downstream.put(None)
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(stage(scan, scan_workers, item_queue, chunk_workers))
+                tg.create_task(stage(chunk, chunk_workers, embed_queue, embed_workers))
+                tg.create_task(stage(embed, embed_workers, upsert_queue, upsert_workers))
+                tg.create_task(stage(upsert, upsert_workers, None, 0))
+        except ExceptionGroup as eg:
+            raise eg.exceptions[0] from None
+        finally:
+            if self.chunk_cache:
+                await asyncio.to_thread(self.chunk_cache.flush)
+
+        if failed:
+            for _, manifests in feeds:
+                for source_id in set(failed.values()) & manifests.keys():
+                    manifests[source_id] = [i for i in manifests[source_id] if i not in failed]
+        return set(failed.values())
+
+    async def _embed_chunks(self, chunks: list[KnowledgeChunk], result: IngestResult) -> None:
         if not self.embedding_service:
             return
 
-        batch_size = 20
-        for i in range(0, len(chunks), batch_size):
-            batch = chunks[i : i + batch_size]
-            texts = [c.content for c in batch]
-            embeddings = await self.embedding_service.embed(texts)
+        pending = chunks
+        if self.embedding_cache:
+            cached = await asyncio.to_thread(
+                self.embedding_cache.get_many, [c.content_hash for c in chunks]
+            )
+            pending = []
+            for chunk in chunks:
+                if chunk.content_hash in cached:
+                    chunk.embedding = cached[chunk.content_hash]
+                else:
+                    pending.append(chunk)
+
+        if not pending:
+            return
+
+        texts = [c.content for c in pending]
+        try:
+            embeddings = np.asarray(await self._embedder.embed(texts), dtype=np.float32)
+            failed = np.zeros(len(pending), dtype=bool)
+        except EmbeddingError as e:
+            result.errors.append(str(e))
+            embeddings, failed = e.embeddings, e.failed
+
+        for chunk, vector, missing in zip(pending, embeddings, failed, strict=False):
+            chunk.embedding = None if missing else vector
 
-            for j, chunk in enumerate(batch):
-                if j < len(embeddings):
-                    chunk.embedding = embeddings[j]
+        if self.embedding_cache:
+            await asyncio.to_thread(
+                self.embedding_cache.put_many,
+                {c.content_hash: c.embedding for c in pending if c.embedding is not None},
+            )
 
     async def search(
         self,
@@ -236,8 +646,8 @@ class IngestionPipeline:
         if not self.embedding_service or not self.vector_store:
             await self.initialize()
 
-        query_embedding = await self.embedding_service.embed_single(query)
-        return self.vector_store.search(
+        query_embedding = await self._embed_query(query)
+        return self._store.search(
             query_vector=query_embedding,
             limit=limit,
             source_type=source_type,
@@ -246,3 +656,17 @@ class IngestionPipeline:
             project_id=project_id,
             context_lines=context_lines,
         )
+
+    async def _embed_query(self, query: str) -> np.ndarray:
+        query_hash = hashlib.sha256(query.encode()).hexdigest()[:16]
+        if self.embedding_cache:
+            cached = await asyncio.to_thread(self.embedding_cache.get, query_hash)
+            if cached is not None:
+                return cached
+
+        query_embedding = np.asarray(
+            await self._embedder.embed_single(query), dtype=np.float32
+        )
+        if self.embedding_cache:
+            await asyncio.to_thread(self.embedding_cache.put, query_hash, query_embedding)
+        return query_embedding
@@ -1,13 +1,22 @@
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Any
 from uuid import uuid4
 
+from maomao.lazy import lazy_defaults
 
-@dataclass
+
+@lazy_defaults(
+    id=lambda _: str(uuid4()),
+    created_at=lambda _: datetime.now(),
+    # An item that was never updated was last updated when it was created.
+    updated_at=lambda item: item.created_at,
+)
+@dataclass(slots=True)
 class SourceItem:
-    id: str = field(default_factory=lambda: str(uuid4()))
+    id: str | None = None
     content: str = ""
     source_type: str = ""
     source_path: str = ""
@@ -16,9 +25,10 @@ class SourceItem:
     project_id: str = ""
     metadata: dict[str, Any] = field(default_factory=dict)
     content_hash: str = ""
-    created_at: datetime = field(default_factory=datetime.now)
-    updated_at: datetime = field(default_factory=datetime.now)
+    created_at: datetime | None = None
+    updated_at: datetime | None = None
     chunker_type: str = "text"
+    state: dict[str, Any] = field(default_factory=dict)
 
 
 @dataclass
@@ -26,6 +36,8 @@ class SourceChange:
     added: list[SourceItem] = field(default_factory=list)
     updated: list[SourceItem] = field(default_factory=list)
     deleted_ids: list[str] = field(default_factory=list)
+    refreshed: dict[str, dict[str, Any]] = field(default_factory=dict)
+    checkpoint: dict[str, Any] = field(default_factory=dict)
 
 
 class KnowledgeSource(ABC):
@@ -47,10 +59,24 @@ class KnowledgeSource(ABC):
     def from_config(cls, config: dict[str, Any]) -> "KnowledgeSource":
         pass
 
+    def location(self) -> str:
+        """Where this source reads from, to tell apart sources of one type."""
+        return ""
+
+    def state_key(self) -> str:
+        """Key for this source instance's entry in the ingestion state."""
+        return ":".join(
+            [self.source_type(), self.knowledge_scope, self.project_id, self.location()]
+        )
+
     @abstractmethod
     async def scan(self) -> list[SourceItem]:
         pass
 
+    async def iter_items(self) -> AsyncIterator[SourceItem]:
+        for item in await self.scan():
+            yield item
+
     @abstractmethod
     async def get_changes(self, state: dict[str, Any]) -> SourceChange:
         pass
@@ -1,3 +1,6 @@
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Sequence
 from typing import Any
 
 import httpx
@@ -10,6 +13,9 @@ console = Console()
 
 @SourceRegistry.register
 class SiyuanSource(KnowledgeSource):
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    BLOCK_COLUMNS = ("id", "hpath", "box", "content", "created", "updated")
+
     def __init__(
         self,
         api_url: str = "http://127.0.0.1:6806",
@@ -17,6 +23,10 @@ class SiyuanSource(KnowledgeSource):
         box_id: str = "",
         root_block_id: str = "",
         chunker_type: str = "markdown",
+        concurrency: int = 8,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        page_size: int = 1000,
         knowledge_scope: str = "global",
         project_id: str = "",
     ):
@@ -26,6 +36,10 @@ class SiyuanSource(KnowledgeSource):
         self.box_id = box_id
         self.root_block_id = root_block_id
         self.chunker_type = chunker_type
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.page_size = max(1, page_size)
         self._client: httpx.AsyncClient | None = None
 
     @classmethod
@@ -45,10 +59,17 @@ class SiyuanSource(KnowledgeSource):
             box_id=config.get("box_id", ""),
             root_block_id=config.get("root_block_id", ""),
             chunker_type=config.get("chunker_type", "markdown"),
+            concurrency=config.get("concurrency", 8),
+            max_retries=config.get("max_retries", 3),
+            retry_backoff=config.get("retry_backoff", 0.5),
+            page_size=config.get("page_size", 1000),
             knowledge_scope=knowledge_scope,
             project_id=project_id,
         )
 
+    def location(self) -> str:
+        return "/".join([self.api_url.rstrip("/"), self.box_id, self.root_block_id])
+
     @property
     def client(self) -> httpx.AsyncClient:
         if self._client is None:
@@ -59,6 +80,10 @@ class SiyuanSource(KnowledgeSource):
                 base_url=self.api_url,
                 headers=headers,
                 timeout=60.0,
+                limits=httpx.Limits(
+                    max_connections=self.concurrency,
+                    max_keepalive_connections=self.concurrency,
+                ),
                 trust_env=False,
             )
         return self._client
@@ -69,85 +94,154 @@ class SiyuanSource(KnowledgeSource):
             self._client = None
 
     async def scan(self) -> list[SourceItem]:
+        return [item async for item in self.iter_items()]
+
+    async def iter_items(self) -> AsyncIterator[SourceItem]:
         if not self.box_id:
             console.print("[yellow]SiyuanSource: box_id not configured[/yellow]")
-            return []
-
-        items: list[SourceItem] = []
-        blocks = await self._fetch_blocks()
-
-        for block in blocks:
-            block_id = block.get("id", "")
-            content = await self._fetch_block_content(block_id)
+            return
 
-            if not content.strip():
-                continue
-
-            item = SourceItem(
-                source_type=self.source_type(),
-                source_path=block.get("hpath", "/"),
-                source_id=block_id,
-                knowledge_scope=self.knowledge_scope,
-                project_id=self.project_id,
-                content=content,
-                content_hash=self._compute_hash(content),
-                chunker_type=self.chunker_type,
-                metadata={
-                    "title": block.get("content", ""),
-                    "box": block.get("box", ""),
-                    "hpath": block.get("hpath", ""),
-                    "created": block.get("created", ""),
-                    "updated": block.get("updated", ""),
-                },
-            )
-            items.append(item)
-
-        return items
+        async for block, content in self._fetch_contents(self._iter_blocks()):
+            if content.strip():
+                yield self._build_item(block, content)
 
     async def get_changes(self, state: dict[str, Any]) -> SourceChange:
-        current_items = await self.scan()
-        current_ids = {item.source_id for item in current_items}
-        current_map = {item.source_id: item for item in current_items}
-
-        previous_state = state.get(self.source_type(), {})
-        previous_ids = set(previous_state.get("ids", []))
-
-        added_ids = current_ids - previous_ids
-        deleted_ids = previous_ids - current_ids
-        common_ids = current_ids & previous_ids
+        if not self.box_id:
+            console.print("[yellow]SiyuanSource: box_id not configured[/yellow]")
+            return SourceChange()
 
-        added = [current_map[i] for i in added_ids]
-        deleted = list(deleted_ids)
+        files = state.get("files", {})
+        previous_ids = set(state.get("ids", []))
+        previous_hashes = state.get("hashes", {})
+        last_sync = state.get("last_sync") or max(
+            (entry.get("updated", "") for entry in files.values()), default=""
+        )
 
-        updated: list[SourceItem] = []
-        previous_hashes = previous_state.get("hashes", {})
-        for item_id in common_ids:
-            item = current_map[item_id]
-            if item.content_hash != previous_hashes.get(item_id):
-                updated.append(item)
+        current_ids = await self._fetch_block_ids()
+        condition = f"updated >= '{last_sync}'" if last_sync else ""
+        blocks = [block async for block in self._iter_blocks(condition=condition)]
+        high_water = max([last_sync, *(block.get("updated", "") for block in blocks)])
+
+        changed = [
+            block
+            for block in blocks
+            if block.get("id") not in previous_ids
+            or files.get(block.get("id"), {}).get("updated") != block.get("updated")
+        ]
+
+        changes = SourceChange(
+            deleted_ids=sorted(previous_ids - current_ids),
+            checkpoint={"last_sync": high_water},
+        )
+        async for block, content in self._fetch_contents(self._iter_list(changed)):
+            block_id = block.get("id", "")
+            if not content.strip():
+                if block_id in previous_ids:
+                    changes.deleted_ids.append(block_id)
+                continue
 
-        return SourceChange(added=added, updated=updated, deleted_ids=deleted)
+            item = self._build_item(block, content)
+            if block_id not in previous_ids:
+                changes.added.append(item)
+            elif item.content_hash != previous_hashes.get(block_id):
+                changes.updated.append(item)
+            else:
+                changes.refreshed[block_id] = item.state
+
+        return changes
+
+    def _build_item(self, block: dict[str, Any], content: str) -> SourceItem:
+        return SourceItem(
+            source_type=self.source_type(),
+            source_path=block.get("hpath", "/"),
+            source_id=block.get("id", ""),
+            knowledge_scope=self.knowledge_scope,
+            project_id=self.project_id,
+            content=content,
+            content_hash=self._compute_hash(content),
+            chunker_type=self.chunker_type,
+            metadata={
+                "title": block.get("content", ""),
+                "box": block.get("box", ""),
+                "hpath": block.get("hpath", ""),
+                "created": block.get("created", ""),
+                "updated": block.get("updated", ""),
+            },
+            state={"updated": block.get("updated", "")},
+        )
 
-    async def _fetch_blocks(self) -> list[dict[str, Any]]:
-        stmt = "SELECT * FROM blocks WHERE type = 'd'"
+    def _scope_condition(self) -> str:
+        stmt = "type = 'd'"
         if self.root_block_id:
             stmt += f" AND root_id = '{self.root_block_id}'"
         if self.box_id:
             stmt += f" AND box = '{self.box_id}'"
-        stmt += " ORDER BY updated DESC"
-
-        response = await self.client.post(
-            "/api/query/sql",
-            json={"stmt": stmt},
-        )
-        response.raise_for_status()
-        return response.json().get("data", [])
+        return stmt
+
+    async def _fetch_block_ids(self) -> set[str]:
+        return {block["id"] async for block in self._iter_blocks(columns=("id",))}
+
+    async def _iter_blocks(
+        self, columns: Sequence[str] = BLOCK_COLUMNS, condition: str = ""
+    ) -> AsyncIterator[dict[str, Any]]:
+        where = self._scope_condition()
+        if condition:
+            where += f" AND {condition}"
+
+        last_id = ""
+        while True:
+            stmt = (
+                f"SELECT {', '.join(columns)} FROM blocks WHERE {where} AND id > '{last_id}' "
+                f"ORDER BY id LIMIT {self.page_size}"
+            )
+            response = await self._post("/api/query/sql", {"stmt": stmt})
+            rows = response.json().get("data") or []
+            for row in rows:
+                yield row
+            # The statement carries its own LIMIT, so a short page is the last.
+            if len(rows) < self.page_size:
+                return
+            last_id = rows[-1]["id"]
+
+    async def _fetch_contents(
+        self, blocks: AsyncIterable[dict[str, Any]]
+    ) -> AsyncIterator[tuple[dict[str, Any], str]]:
+        pending: deque[tuple[dict[str, Any], asyncio.Task[str]]] = deque()
+        try:
+            async for block in blocks:
+                task = asyncio.create_task(self._fetch_block_content(block.get("id", "")))
+                pending.append((block, task))
+                if len(pending) >= self.concurrency:
+                    head, head_task = pending.popleft()
+                    yield head, await head_task
+
+            while pending:
+                head, head_task = pending.popleft()
+                yield head, await head_task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _iter_list(self, blocks: list[dict[str, Any]]) -> AsyncIterator[dict[str, Any]]:
+        for block in blocks:
+            yield block
 
     async def _fetch_block_content(self, block_id: str) -> str:
-        response = await self.client.post(
-            "/api/export/exportMdContent",
-            json={"id": block_id},
-        )
-        response.raise_for_status()
+        response = await self._post("/api/export/exportMdContent", {"id": block_id})
         data = response.json()
         return data.get("data", {}).get("content", "")
+
+    async def _post(self, url: str, payload: dict[str, Any]) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.client.post(url, json=payload)
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    return response
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self.retry_backoff * 2**attempt)
+        raise RuntimeError("unreachable")
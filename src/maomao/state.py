@@ -32,11 +32,14 @@ class StateManager:
         with open(self.state_file, "w") as f:
             json.dump(self.state.model_dump(), f, indent=2, default=str)
 
-    def get_source_state(self, source_type: str) -> dict[str, Any]:
-        return self.state.source_states.get(source_type, {})
+    def get_source_state(self, source_key: str) -> dict[str, Any]:
+        return self.state.source_states.get(source_key, {})
 
-    def update_source_state(self, source_type: str, source_state: dict[str, Any]) -> None:
-        self.state.source_states[source_type] = source_state
+    def update_source_state(self, source_key: str, source_state: dict[str, Any]) -> None:
+        self.state.source_states[source_key] = source_state
+
+    def remove_source_state(self, source_key: str) -> None:
+        self.state.source_states.pop(source_key, None)
 
     def mark_full_ingest(self) -> None:
         self.state.last_full_ingest = datetime.now()
@@ -1,5 +1,7 @@
 import os
+from typing import Any
 
+import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.exceptions import UnexpectedResponse
@@ -11,13 +13,13 @@ from maomao.models import ChunkLocation, KnowledgeChunk, SearchResult
 console = Console()
 
 
-def _disable_proxy_env():
+def _disable_proxy_env() -> dict[str, str | None]:
     proxy_vars = ['http_proxy', 'https_proxy', 'HTTP_PROXY', 'HTTPS_PROXY',
                   'all_proxy', 'ALL_PROXY', 'no_proxy', 'NO_PROXY']
     return {k: os.environ.pop(k, None) for k in proxy_vars}
 
 
-def _restore_proxy_env(saved):
+def _restore_proxy_env(saved: dict[str, str | None]) -> None:
     for k, v in saved.items():
         if v is not None:
             os.environ[k] = v
@@ -55,50 +57,73 @@ class VectorStore:
         finally:
             _restore_proxy_env(saved)
 
+    def _chunk_payload(self, chunk: KnowledgeChunk) -> dict[str, Any]:
+        payload: dict[str, Any] = {
+            "content": chunk.content,
+            "source_type": chunk.source_type,
+            "source_path": chunk.source_path,
+            "source_id": chunk.source_id,
+            "knowledge_scope": chunk.knowledge_scope,
+            "project_id": chunk.project_id,
+            "metadata": chunk.metadata,
+            "content_hash": chunk.content_hash,
+        }
+
+        if chunk.location:
+            payload["location"] = {
+                "start_line": chunk.location.start_line,
+                "end_line": chunk.location.end_line,
+                "char_start": chunk.location.char_start,
+                "char_end": chunk.location.char_end,
+            }
+
+        return payload
+
     def upsert_chunks(self, chunks: list[KnowledgeChunk]) -> None:
-        if not chunks:
+        embedded = [(chunk, chunk.embedding) for chunk in chunks if chunk.embedding is not None]
+        if not embedded:
             return
 
-        points = []
-        for chunk in chunks:
-            if chunk.embedding is None:
-                continue
-
-            payload = {
-                "content": chunk.content,
-                "source_type": chunk.source_type,
-                "source_path": chunk.source_path,
-                "source_id": chunk.source_id,
-                "knowledge_scope": chunk.knowledge_scope,
-                "project_id": chunk.project_id,
-                "metadata": chunk.metadata,
-                "content_hash": chunk.content_hash,
-            }
+        # One float32 matrix for the whole batch; the client slices it into
+        # requests itself instead of validating a list of floats per point.
+        chunks = [chunk for chunk, _ in embedded]
+        vectors = np.stack([embedding for _, embedding in embedded], dtype=np.float32)
 
-            if chunk.location:
-                payload["location"] = {
-                    "start_line": chunk.location.start_line,
-                    "end_line": chunk.location.end_line,
-                    "char_start": chunk.location.char_start,
-                    "char_end": chunk.location.char_end,
-                }
-
-            point = models.PointStruct(
-                id=chunk.id,
-                vector=chunk.embedding,
-                payload=payload,
+        saved = _disable_proxy_env()
+        try:
+            self.client.upload_collection(
+                collection_name=self.config.collection_name,
+                vectors=vectors,
+                payload=[self._chunk_payload(chunk) for chunk in chunks],
+                ids=[chunk.id for chunk in chunks],
+                batch_size=len(chunks),
+                wait=True,
             )
-            points.append(point)
+        finally:
+            _restore_proxy_env(saved)
 
-        if points:
-            saved = _disable_proxy_env()
-            try:
-                self.client.upsert(
-                    collection_name=self.config.collection_name,
-                    points=points,
+    def update_payloads(self, chunks: list[KnowledgeChunk]) -> None:
+        if not chunks:
+            return
+
+        operations = [
+            models.OverwritePayloadOperation(
+                overwrite_payload=models.SetPayload(
+                    payload=self._chunk_payload(chunk),
+                    points=[chunk.id],
                 )
-            finally:
-                _restore_proxy_env(saved)
+            )
+            for chunk in chunks
+        ]
+
+        saved = _disable_proxy_env()
+        try:
+            self.client.batch_update_points(
+                collection_name=self.config.collection_name,
+                update_operations=operations,
+            )
+        finally:
+            _restore_proxy_env(saved)
 
     def delete_chunks(self, chunk_ids: list[str]) -> None:
         if not chunk_ids:
@@ -148,7 +173,7 @@ class VectorStore:
 
     def search(
         self,
-        query_vector: list[float],
+        query_vector: np.ndarray | list[float],
         limit: int = 10,
         source_type: str | None = None,
         source_path_prefix: str | None = None,
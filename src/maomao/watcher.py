@@ -0,0 +1,130 @@
+import asyncio
+import os
+from pathlib import Path
+
+from rich.console import Console
+from watchdog.events import EVENT_TYPE_MODIFIED, FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from maomao.pipeline import IngestionPipeline
+from maomao.sources import LocalDocSource
+
+console = Console()
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    IGNORED_EVENTS = {"opened", "closed_no_write"}
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: asyncio.Queue[tuple[int, list[str], bool]],
+        index: int,
+        source: LocalDocSource,
+    ):
+        self._loop = loop
+        self._queue = queue
+        self._index = index
+        self._base_path = Path(source.path).expanduser().absolute()
+        self._skip_dirs = source.SKIP_DIRS
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        if event.event_type in self.IGNORED_EVENTS:
+            return
+        if event.is_directory and event.event_type == EVENT_TYPE_MODIFIED:
+            return
+
+        paths = [os.fsdecode(event.src_path)]
+        dest_path = getattr(event, "dest_path", "")
+        if dest_path:
+            paths.append(os.fsdecode(dest_path))
+        paths = [p for p in paths if not self._in_skipped_dir(p)]
+        if paths:
+            self._loop.call_soon_threadsafe(
+                self._queue.put_nowait, (self._index, paths, event.is_directory)
+            )
+
+    def _in_skipped_dir(self, path: str) -> bool:
+        try:
+            parts = Path(path).relative_to(self._base_path).parts
+        except ValueError:
+            return True
+        return any(part in self._skip_dirs for part in parts)
+
+
+class DocWatcher:
+    def __init__(self, pipeline: IngestionPipeline, debounce_seconds: float):
+        self.pipeline = pipeline
+        self.debounce_seconds = debounce_seconds
+
+    async def run(self) -> None:
+        result = await self.pipeline.run_incremental_ingest()
+        console.print(
+            f"[green]Initial sync: +{result.new_chunks} ~{result.updated_chunks} "
+            f"-{result.deleted_chunks} chunks[/green]"
+        )
+
+        sources = [s for s in self.pipeline.sources if isinstance(s, LocalDocSource)]
+        if not sources:
+            console.print("[yellow]No local_doc sources to watch[/yellow]")
+            await self.pipeline.close()
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue[tuple[int, list[str], bool]] = asyncio.Queue()
+        observer = Observer()
+        for index, source in enumerate(sources):
+            path = Path(source.path).expanduser().absolute()
+            if not path.exists():
+                console.print(f"[red]Watch path does not exist: {path}[/red]")
+                continue
+            observer.schedule(
+                _ChangeHandler(loop, queue, index, source), str(path), recursive=source.recursive
+            )
+            console.print(f"[cyan]Watching {path}[/cyan]")
+
+        observer.start()
+        try:
+            while True:
+                batch = await self._collect(queue)
+                for index, (paths, rescan) in batch.items():
+                    await self._ingest(sources[index], paths, rescan)
+        finally:
+            observer.stop()
+            await asyncio.to_thread(observer.join)
+            await self.pipeline.close()
+
+    async def _collect(
+        self, queue: asyncio.Queue[tuple[int, list[str], bool]]
+    ) -> dict[int, tuple[set[str], bool]]:
+        batch: dict[int, tuple[set[str], bool]] = {}
+        event = await queue.get()
+        while True:
+            index, paths, is_directory = event
+            touched, rescan = batch.get(index, (set(), False))
+            touched.update(paths)
+            batch[index] = (touched, rescan or is_directory)
+            try:
+                event = await asyncio.wait_for(queue.get(), self.debounce_seconds)
+            except TimeoutError:
+                return batch
+
+    async def _ingest(self, source: LocalDocSource, paths: set[str], rescan: bool) -> None:
+        state = self.pipeline.source_state(source)
+        if rescan:
+            changes = await source.get_changes(state)
+        else:
+            changes = await source.get_path_changes(paths, state)
+
+        if not (changes.added or changes.updated or changes.deleted_ids or changes.refreshed):
+            return
+
+        result = await self.pipeline.ingest_changes(source, changes)
+        console.print(
+            f"[green]Re-ingested {len(changes.added) + len(changes.updated)} files, "
+            f"removed {len(changes.deleted_ids)}: +{result.new_chunks} "
+            f"~{result.updated_chunks} -{result.deleted_chunks} chunks "
+            f"in {result.duration_seconds:.2f}s[/green]"
+        )
+        for error in result.errors:
+            console.print(f"[red]  {error}[/red]")
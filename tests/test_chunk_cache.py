@@ -0,0 +1,90 @@
+import pytest
+from maomao.chunk_cache import ChunkCache, chunker_fingerprint
+from maomao.chunkers import MarkdownChunker, TextChunker
+
+CONTENT = "# Title\n\nFirst paragraph of the document.\n\n## Section\n\nSecond paragraph here.\n"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ChunkCache(tmp_path / "chunks.db", max_entries=2)
+    yield cache
+    cache.close()
+
+
+def as_tuples(chunks):
+    return [(c.content, c.content_hash, c.location, c.metadata) for c in chunks]
+
+
+class TestChunkCache:
+    def test_miss_then_hit_rebuilds_chunks(self, cache):
+        metadata = {"filename": "doc.md"}
+        chunks = MarkdownChunker(min_chunk_size=5).chunk(CONTENT, metadata)
+
+        assert cache.get("h1", "markdown", "fp", CONTENT, metadata) is None
+        cache.put("h1", "markdown", "fp", CONTENT, metadata, chunks)
+        cached = cache.get("h1", "markdown", "fp", CONTENT, metadata)
+
+        assert as_tuples(cached) == as_tuples(chunks)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_stores_joined_content_that_is_not_a_slice(self, cache):
+        content = "para one is here  \n\npara two is here"
+        chunks = TextChunker(chunk_size=100, chunk_overlap=0, min_chunk_size=1).chunk(content)
+        cache.put("h1", "text", "fp", content, {}, chunks)
+        assert as_tuples(cache.get("h1", "text", "fp", content, {})) == as_tuples(chunks)
+
+    def test_layers_chunker_metadata_over_current_item_metadata(self, cache):
+        chunks = MarkdownChunker(min_chunk_size=5).chunk(CONTENT, {"filename": "old.md"})
+        cache.put("h1", "markdown", "fp", CONTENT, {"filename": "old.md"}, chunks)
+        cached = cache.get("h1", "markdown", "fp", CONTENT, {"filename": "new.md"})
+        assert all(c.metadata["filename"] == "new.md" for c in cached)
+        assert cached[0].metadata["title"] == "Title"
+
+    def test_keyed_by_chunker_type_and_fingerprint(self, cache):
+        cache.put("h1", "markdown", "fp", CONTENT, {}, [])
+        assert cache.get("h1", "text", "fp", CONTENT, {}) is None
+        assert cache.get("h1", "markdown", "other", CONTENT, {}) is None
+        assert cache.get("h1", "markdown", "fp", CONTENT, {}) == []
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put("a", "text", "fp", "", {}, [])
+        cache.put("b", "text", "fp", "", {}, [])
+        cache.get("a", "text", "fp", "", {})
+        cache.put("c", "text", "fp", "", {}, [])
+
+        assert cache.count() == 2
+        assert cache.get("b", "text", "fp", "", {}) is None
+        assert cache.get("a", "text", "fp", "", {}) is not None
+
+    def test_batches_writes_until_flush(self, tmp_path):
+        cache = ChunkCache(tmp_path / "batched.db", flush_every=3)
+        try:
+            cache.put("a", "text", "fp", "", {}, [])
+            cache.put("b", "text", "fp", "", {}, [])
+            stored = cache.conn.execute("SELECT COUNT(*) FROM chunk_manifests").fetchone()[0]
+            assert stored == 0
+            assert cache.get("a", "text", "fp", "", {}) == []
+
+            cache.put("c", "text", "fp", "", {}, [])
+            stored = cache.conn.execute("SELECT COUNT(*) FROM chunk_manifests").fetchone()[0]
+            assert stored == 3
+        finally:
+            cache.close()
+
+    def test_close_flushes_pending_writes(self, tmp_path):
+        cache = ChunkCache(tmp_path / "chunks.db")
+        cache.put("a", "text", "fp", "", {}, [])
+        cache.close()
+
+        reopened = ChunkCache(tmp_path / "chunks.db")
+        try:
+            assert reopened.get("a", "text", "fp", "", {}) == []
+        finally:
+            reopened.close()
+
+    def test_fingerprint_tracks_config_and_chunker_inputs(self):
+        base = chunker_fingerprint("code", {"max_chunk_size": 512}, {"extension": ".py"})
+        assert base == chunker_fingerprint("code", {"max_chunk_size": 512}, {"extension": ".py"})
+        assert base != chunker_fingerprint("code", {"max_chunk_size": 256}, {"extension": ".py"})
+        assert base != chunker_fingerprint("code", {"max_chunk_size": 512}, {"extension": ".go"})
@@ -1,7 +1,10 @@
 import pytest
+from maomao.chunkers import base as chunkers_base
 from maomao.chunkers.base import Chunk, ChunkerRegistry, ChunkLocation
+from maomao.chunkers.code import CodeChunker
 from maomao.chunkers.markdown import MarkdownChunker
 from maomao.chunkers.text import TextChunker
+from maomao.chunkers.tokens import TokenCounter
 
 
 class TestChunkLocation:
@@ -52,6 +55,39 @@ class TestChunk:
         assert chunk.location.start_line == 1
         assert chunk.location.end_line == 5
 
+    def test_chunk_is_slotted_and_keeps_constructor_args(self):
+        chunk = Chunk(content="test content")
+        assert not hasattr(chunk, "__dict__")
+        assert chunk.id == chunk.id
+        assert Chunk().id != chunk.id
+        assert Chunk(id="fixed", content="x").id == "fixed"
+
+    def test_chunk_id_is_minted_on_first_read(self, monkeypatch):
+        minted: list[str] = []
+        real_uuid4 = chunkers_base.uuid4
+
+        def counting_uuid4():
+            value = real_uuid4()
+            minted.append(str(value))
+            return value
+
+        monkeypatch.setattr(chunkers_base, "uuid4", counting_uuid4)
+        chunks = [Chunk(content=str(i)) for i in range(3)]
+        assert minted == []
+
+        assert chunks[0].id == chunks[0].id == minted[0]
+        assert len(minted) == 1
+
+    def test_chunks_share_item_metadata(self):
+        metadata = {"source": "test.md", "tags": ["a"]}
+        chunker = TextChunker(chunk_size=30, chunk_overlap=0, min_chunk_size=1)
+        chunks = chunker.chunk("first paragraph text\n\nsecond paragraph text", metadata)
+        assert len(chunks) == 2
+        assert chunks[0].metadata.base is chunks[1].metadata.base
+        assert chunks[0].metadata == {**metadata, "chunk_index": 0, "chunk_size": 20}
+        assert chunks[1].metadata["chunk_index"] == 1
+        assert chunks[0].metadata.to_dict() == dict(chunks[0].metadata)
+
 
 class TestMarkdownChunker:
     def test_chunker_type(self):
@@ -112,6 +148,52 @@ This is content under subtitle 1.1.
             assert chunk.location.char_start >= 0
             assert chunk.location.char_end > chunk.location.char_start
 
+    def test_chunk_location_with_repeated_sections(self):
+        chunker = MarkdownChunker(max_chunk_size=1000, min_chunk_size=5)
+        content = "# A\n\nSame body.\n\n# B\n\nSame body.\n\n# A\n\nSame body.\n"
+        chunks = chunker.chunk(content)
+        assert [c.location.start_line for c in chunks] == [1, 5, 9]
+        for chunk in chunks:
+            loc = chunk.location
+            assert content[loc.char_start:loc.char_end] == chunk.content
+
+    def test_chunk_location_in_split_paragraphs(self):
+        chunker = MarkdownChunker(max_chunk_size=40, min_chunk_size=5, heading_levels=[1])
+        content = "# T\n\n" + "\n\n".join(["repeat paragraph"] * 6) + "\n"
+        chunks = chunker.chunk(content)
+        assert len(chunks) > 1
+        starts = [c.location.char_start for c in chunks]
+        assert starts == sorted(set(starts))
+        for chunk in chunks:
+            loc = chunk.location
+            assert content[loc.char_start:loc.char_end] == chunk.content
+            assert loc.start_line == content.count("\n", 0, loc.char_start) + 1
+
+    def test_headings_inside_fenced_code_do_not_split(self):
+        chunker = MarkdownChunker(max_chunk_size=1000, min_chunk_size=5)
+        content = "# Setup\n\n```bash\n# install deps\n\npip install maomao\n```\n\nDone.\n"
+        chunks = chunker.chunk(content)
+        assert len(chunks) == 1
+        assert chunks[0].metadata["title"] == "Setup"
+        assert "# install deps" in chunks[0].content
+
+    def test_fenced_code_stays_in_one_paragraph(self):
+        chunker = MarkdownChunker(max_chunk_size=60, min_chunk_size=5, heading_levels=[1])
+        fence = "~~~\nline one\n\nline two\n\nline three\n~~~"
+        content = "# T\n\nIntro paragraph text.\n\n" + fence + "\n"
+        chunks = chunker.chunk(content)
+        assert any(chunk.content == fence for chunk in chunks)
+
+    def test_long_paragraph_respects_max_chunk_size(self):
+        chunker = MarkdownChunker(max_chunk_size=60, min_chunk_size=1)
+        content = "# 标题\n\n" + "第一句很长，第二句也很长。" * 30 + "\n"
+        chunks = chunker.chunk(content)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.content) <= 60
+            loc = chunk.location
+            assert content[loc.char_start:loc.char_end] == chunk.content
+
 
 class TestTextChunker:
     def test_chunker_type(self):
@@ -152,12 +234,160 @@ class TestTextChunker:
             assert chunk.location.char_start >= 0
             assert chunk.location.char_end > chunk.location.char_start
 
+    def test_chunk_location_with_repeated_paragraphs(self):
+        chunker = TextChunker(chunk_size=30, chunk_overlap=0, min_chunk_size=5)
+        content = "\n\n".join(["same paragraph text"] * 4)
+        chunks = chunker.chunk(content)
+        assert [c.location.start_line for c in chunks] == [1, 3, 5, 7]
+        for chunk in chunks:
+            loc = chunk.location
+            assert content[loc.char_start:loc.char_end] == chunk.content
+
+    def test_long_cjk_paragraph_split_at_sentences(self):
+        chunker = TextChunker(chunk_size=50, chunk_overlap=0, min_chunk_size=1)
+        content = "这是一个没有空行的很长的段落。" * 20
+        chunks = chunker.chunk(content)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert len(chunk.content) <= 50
+            assert chunk.content.endswith("。")
+        assert "".join(c.content for c in chunks) == content
+
+    def test_chunk_size_is_a_hard_cap(self):
+        chunker = TextChunker(chunk_size=40, chunk_overlap=10, min_chunk_size=1)
+        content = "无标点的超长文本" * 30 + "\n\n" + "short clause, another clause, " * 10
+        chunks = chunker.chunk(content)
+        assert all(len(c.content) <= 40 for c in chunks)
+
+
+PYTHON_SOURCE = '''import os
+
+
+# Adds two numbers.
+def add(a, b):
+    return a + b
+
+
+class Greeter:
+    def greet(self, name):
+        return f"hello {name}"
+'''
+
+
+class TestCodeChunker:
+    def test_chunker_type(self):
+        assert CodeChunker.chunker_type() == "code"
+
+    def test_from_config(self):
+        chunker = CodeChunker.from_config({"max_chunk_size": 800, "language": "python"})
+        assert chunker.max_chunk_size == 800
+        assert chunker.language == "python"
+
+    def test_unknown_language_falls_back_to_paragraphs(self):
+        chunker = CodeChunker(max_chunk_size=100, min_chunk_size=5)
+        content = "first block of code\n\nsecond block of code"
+        chunks = chunker.chunk(content, {"extension": ".unknown"})
+        assert [c.content for c in chunks] == ["first block of code\n\nsecond block of code"]
+
+    def test_split_by_top_level_definitions(self):
+        pytest.importorskip("tree_sitter_python")
+        chunker = CodeChunker(max_chunk_size=1000, min_chunk_size=5)
+        chunks = chunker.chunk(PYTHON_SOURCE, {"extension": ".py"})
+        assert [c.metadata["symbols"] for c in chunks] == [[], ["add"], ["Greeter"]]
+        assert chunks[1].content.startswith("# Adds two numbers.")
+        assert (chunks[1].location.start_line, chunks[1].location.end_line) == (4, 6)
+        for chunk in chunks:
+            assert chunk.metadata["language"] == "python"
+            loc = chunk.location
+            assert PYTHON_SOURCE[loc.char_start:loc.char_end] == chunk.content
+
+    def test_large_definition_split_along_children(self):
+        pytest.importorskip("tree_sitter_python")
+        methods = "".join(f"    def m{i}(self):\n        return {i}\n\n" for i in range(20))
+        content = "class Big:\n" + methods
+        chunker = CodeChunker(max_chunk_size=120, min_chunk_size=5)
+        chunks = chunker.chunk(content, {"extension": ".py"})
+        assert len(chunks) > 1
+        assert chunks[0].content.startswith("class Big:")
+        assert all(len(c.content) <= 120 for c in chunks)
+
+    def test_sizes_are_measured_in_characters(self):
+        pytest.importorskip("tree_sitter_python")
+        methods = "".join(f"    def m{i}(self):\n        return '中文{i}'\n\n" for i in range(20))
+        content = "class Big:\n" + methods
+        chunker = CodeChunker(max_chunk_size=120, min_chunk_size=5)
+        chunks = chunker.chunk(content, {"extension": ".py"})
+        assert all(len(c.content) <= 120 for c in chunks)
+        assert max(len(c.content.encode("utf-8")) for c in chunks) > 120
+        for chunk in chunks:
+            loc = chunk.location
+            assert content[loc.char_start:loc.char_end] == chunk.content
+
+    def test_incremental_reparse_reuses_previous_tree(self):
+        pytest.importorskip("tree_sitter_python")
+        chunker = CodeChunker(max_chunk_size=1000, min_chunk_size=5)
+        first = chunker.chunk(PYTHON_SOURCE, {"extension": ".py"}, source_id="a.py")
+        changed = PYTHON_SOURCE.replace("a + b", "a - b")
+        second = chunker.chunk(changed, {"extension": ".py"}, source_id="a.py")
+        fresh = CodeChunker(max_chunk_size=1000, min_chunk_size=5).chunk(
+            changed, {"extension": ".py"}
+        )
+        assert [c.content for c in second] == [c.content for c in fresh]
+        assert first[2].content_hash == second[2].content_hash
+        assert first[1].content_hash != second[1].content_hash
+
+
+class TestTokenCounter:
+    def test_estimate_weights_cjk_higher_than_ascii(self):
+        assert TokenCounter.estimate("中文" * 50) > TokenCounter.estimate("ab" * 50)
+        assert TokenCounter.estimate("") == 0
+
+    def test_count_is_memoized(self):
+        counter = TokenCounter()
+        calls: list[str] = []
+        counter._count = lambda text: calls.append(text) or 7
+        assert counter.count("paragraph") == 7
+        assert counter.count("paragraph") == 7
+        assert calls == ["paragraph"]
+
+    def test_missing_tokenizer_falls_back_to_estimate(self, tmp_path):
+        counter = TokenCounter(str(tmp_path / "missing.json"))
+        assert not counter.exact
+        assert counter.count("hello world") == TokenCounter.estimate("hello world")
+
+    def test_text_chunker_token_mode(self):
+        chunker = TextChunker.from_config({
+            "chunk_size": 40,
+            "chunk_overlap": 0,
+            "min_chunk_size": 1,
+            "size_unit": "tokens",
+        })
+        assert chunker.token_counter is not None
+        content = "\n\n".join(["这是中文段落。" * 8, "english paragraph " * 8] * 4)
+        chunks = chunker.chunk(content)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert chunker.token_counter.count(chunk.content) <= 42
+
+    def test_markdown_chunker_token_mode(self):
+        chunker = MarkdownChunker.from_config({
+            "max_chunk_size": 30,
+            "min_chunk_size": 1,
+            "size_unit": "tokens",
+        })
+        content = "# 标题\n\n" + "很长的中文句子，没有空行。" * 40 + "\n"
+        chunks = chunker.chunk(content)
+        assert len(chunks) > 1
+        for chunk in chunks:
+            assert chunker.token_counter.count(chunk.content) <= 32
+
 
 class TestChunkerRegistry:
     def test_list_chunkers(self):
         chunkers = ChunkerRegistry.list_chunkers()
         assert "markdown" in chunkers
         assert "text" in chunkers
+        assert "code" in chunkers
 
     def test_get_chunker(self):
         assert ChunkerRegistry.get("markdown") == MarkdownChunker
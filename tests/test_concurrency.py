@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+from maomao.concurrency import AdaptiveLimiter
+from maomao.config import OllamaConfig
+
+
+def limiter(**kwargs) -> AdaptiveLimiter:
+    options = {
+        "min_concurrency": 1,
+        "max_concurrency": 8,
+        "min_batch_size": 4,
+        "max_batch_size": 32,
+        "target_latency": 1.0,
+    }
+    return AdaptiveLimiter(**{**options, **kwargs})
+
+
+class TestAdaptiveLimiter:
+    def test_starts_at_concurrency_floor_and_batch_ceiling(self):
+        window = limiter()
+        assert window.concurrency == 1
+        assert window.batch_size == 32
+
+    def test_grows_additively_under_target_latency(self):
+        window = limiter(max_batch_size=64)
+        window._batch_size = 8
+        for _ in range(6):
+            window.record(time.monotonic(), 0.1, ok=True, size=window.batch_size)
+        assert window.concurrency == 3
+        assert window.batch_size == 32
+
+    def test_only_full_batches_grow_the_batch_size(self):
+        window = limiter()
+        window._batch_size = 8
+        window.record(time.monotonic(), 0.1, ok=True, size=1)
+        assert window.batch_size == 8
+
+    def test_respects_ceiling(self):
+        window = limiter(max_concurrency=2)
+        for _ in range(50):
+            window.record(time.monotonic(), 0.1, ok=True, size=32)
+        assert window.concurrency == 2
+        assert window.batch_size == 32
+
+    def test_halves_on_error_and_slow_responses(self):
+        window = limiter()
+        window._concurrency = 8.0
+        window.record(time.monotonic(), 0.1, ok=False)
+        assert (window.concurrency, window.batch_size) == (4, 16)
+        window.record(time.monotonic(), 5.0, ok=True)
+        assert (window.concurrency, window.batch_size) == (2, 8)
+        assert window.errors == 1
+        assert window.backoffs == 2
+
+    def test_backs_off_once_per_round_trip(self):
+        window = limiter()
+        window._concurrency = 8.0
+        started = time.monotonic()
+        for _ in range(4):
+            window.record(started, 0.1, ok=False)
+        assert window.concurrency == 4
+        assert window.backoffs == 1
+
+    def test_never_drops_below_floor(self):
+        window = limiter(min_concurrency=2)
+        for _ in range(10):
+            window.record(time.monotonic(), 0.1, ok=False)
+        assert window.concurrency == 2
+        assert window.batch_size == 4
+
+    def test_fixed_window_when_not_adaptive(self):
+        window = limiter(adaptive=False)
+        window.record(time.monotonic(), 0.1, ok=False)
+        assert window.concurrency == 8
+        assert window.batch_size == 32
+        assert window.errors == 1
+
+    def test_from_config_uses_batch_size_as_ceiling(self):
+        window = AdaptiveLimiter.from_config(
+            OllamaConfig(batch_size=16, min_batch_size=32, max_concurrency=4)
+        )
+        assert window.max_batch_size == 16
+        assert window.min_batch_size == 16
+        assert window.max_concurrency == 4
+
+
+@pytest.mark.asyncio
+class TestAdaptiveLimiterSlots:
+    async def test_slot_caps_in_flight_requests(self):
+        window = limiter(max_concurrency=3, adaptive=False)
+        peak = 0
+
+        async def request() -> None:
+            nonlocal peak
+            async with window.slot():
+                peak = max(peak, window.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(10)))
+
+        assert peak == 3
+        assert window.in_flight == 0
+        assert window.requests == 10
+
+    async def test_slot_records_failures(self):
+        window = limiter()
+        window._concurrency = 4.0
+
+        with pytest.raises(RuntimeError):
+            async with window.slot():
+                raise RuntimeError("timeout")
+
+        assert window.errors == 1
+        assert window.concurrency == 2
+        assert window.in_flight == 0
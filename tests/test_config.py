@@ -36,6 +36,11 @@ class TestOllamaConfig:
         assert config.embedding_model == "bge-m3"
         assert config.embedding_dim == 1024
         assert config.timeout == 120
+        assert config.use_batch_api is True
+        assert config.batch_size == 64
+        assert config.json_codec == "auto"
+        assert config.adaptive_concurrency is True
+        assert (config.min_concurrency, config.max_concurrency) == (1, 16)
 
 
 class TestQdrantConfig:
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from maomao.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.db", "bge-m3", 3, max_entries=3)
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    def test_miss_then_hit(self, cache):
+        assert cache.get_many(["h1"]) == {}
+        cache.put_many({"h1": [0.5, 0.25, 1.0]})
+        assert cache.get_many(["h1"])["h1"].tolist() == [0.5, 0.25, 1.0]
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_stores_float32_blobs(self, cache):
+        cache.put("h1", [0.1, 0.2, 0.3])
+        blob = cache.conn.execute("SELECT vector FROM embeddings").fetchone()[0]
+        assert len(blob) == 3 * 4
+        assert cache.get("h1") == pytest.approx([0.1, 0.2, 0.3])
+
+    def test_round_trips_float32_arrays(self, cache):
+        vector = np.array([0.1, 0.2, 0.3], dtype=np.float32)
+        cache.put("h1", vector)
+        cached = cache.get("h1")
+        assert cached.dtype == np.float32
+        assert np.array_equal(cached, vector)
+
+    def test_keyed_by_model_and_dim(self, tmp_path, cache):
+        cache.put("h1", [1.0, 2.0, 3.0])
+        other = EmbeddingCache(tmp_path / "embeddings.db", "other-model", 3)
+        try:
+            assert other.get("h1") is None
+        finally:
+            other.close()
+
+    def test_skips_invalid_vectors(self, cache):
+        cache.put_many({"zero": [0.0, 0.0, 0.0], "short": [1.0], "": [1.0, 1.0, 1.0]})
+        assert cache.count() == 0
+
+    def test_evicts_least_recently_used(self, cache):
+        cache.put("a", [1.0, 1.0, 1.0])
+        cache.put("b", [2.0, 2.0, 2.0])
+        cache.put("c", [3.0, 3.0, 3.0])
+        cache.get("a")
+        cache.put("d", [4.0, 4.0, 4.0])
+
+        assert cache.count() == 3
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_running_count_ignores_replaced_entries(self, cache):
+        cache.put_many({"a": [1.0, 1.0, 1.0], "b": [2.0, 2.0, 2.0]})
+        cache.put_many({"a": [3.0, 3.0, 3.0], "c": [4.0, 4.0, 4.0]})
+        cache.put("d", [5.0, 5.0, 5.0])
+
+        stored = cache.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        assert cache.count() == stored == 3
+
+    def test_persists_across_instances(self, tmp_path, cache):
+        cache.put("h1", [1.0, 2.0, 3.0])
+        cache.close()
+        reopened = EmbeddingCache(tmp_path / "embeddings.db", "bge-m3", 3)
+        try:
+            assert reopened.get("h1").tolist() == [1.0, 2.0, 3.0]
+        finally:
+            reopened.close()
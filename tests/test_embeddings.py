@@ -0,0 +1,219 @@
+import json
+
+import httpx
+import numpy as np
+import pytest
+
+from maomao import embeddings as embeddings_module
+from maomao.config import OllamaConfig
+from maomao.embeddings import (
+    EmbeddingError,
+    JsonCodec,
+    OllamaEmbeddingService,
+    OrjsonCodec,
+    get_codec,
+)
+
+
+def make_service(handler, **config) -> OllamaEmbeddingService:
+    service = OllamaEmbeddingService(OllamaConfig(embedding_dim=2, **config))
+    service.client = httpx.AsyncClient(
+        base_url="http://ollama.test",
+        transport=httpx.MockTransport(handler),
+    )
+    service.retry_delay = 0
+    return service
+
+
+def fake_vector(text: str) -> list[float]:
+    return [float(len(text)), 1.0]
+
+
+class TestEmbeddingCodec:
+    BODY = b'{"model":"bge-m3","embeddings":[[0.5,-0.25],[1e-3,2]],"total_duration":7}'
+
+    def test_json_codec_decodes_float32_matrix(self):
+        vectors = JsonCodec().decode(self.BODY, "embeddings")
+        assert vectors.dtype == np.float32
+        assert vectors.shape == (2, 2)
+        assert vectors.ravel().tolist() == pytest.approx([0.5, -0.25, 1e-3, 2.0])
+
+    def test_orjson_codec_matches_json(self):
+        pytest.importorskip("orjson")
+        expected = JsonCodec().decode(self.BODY, "embeddings")
+        assert np.array_equal(OrjsonCodec().decode(self.BODY, "embeddings"), expected)
+
+    def test_missing_key_decodes_empty(self):
+        assert JsonCodec().decode(b'{"error":"boom"}', "embedding").size == 0
+
+    def test_get_codec_falls_back_without_orjson(self, monkeypatch):
+        monkeypatch.setattr(embeddings_module, "HAS_ORJSON", False)
+        assert isinstance(get_codec("auto"), JsonCodec)
+        assert isinstance(get_codec("orjson"), JsonCodec)
+
+    def test_get_codec_honours_json(self):
+        assert isinstance(get_codec("json"), JsonCodec)
+
+
+@pytest.mark.asyncio
+class TestOllamaEmbeddingService:
+    async def test_embed_uses_batch_api(self):
+        requests: list[dict] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            requests.append({"path": request.url.path, **body})
+            return httpx.Response(
+                200, json={"embeddings": [fake_vector(t) for t in body["input"]]}
+            )
+
+        service = make_service(handler, batch_size=2)
+        texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+        embeddings = await service.embed(texts)
+
+        assert embeddings.tolist() == [fake_vector(t) for t in texts]
+        assert [r["path"] for r in requests] == ["/api/embed"] * 3
+        assert [len(r["input"]) for r in requests] == [2, 2, 1]
+        await service.close()
+
+    async def test_embed_returns_contiguous_float32_matrix(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            return httpx.Response(
+                200, json={"embeddings": [fake_vector(t) for t in body["input"]]}
+            )
+
+        service = make_service(handler)
+        embeddings = await service.embed(["a", "bb", "ccc"])
+        empty = await service.embed([])
+
+        assert embeddings.dtype == np.float32
+        assert embeddings.shape == (3, 2)
+        assert embeddings.flags.c_contiguous
+        assert empty.shape == (0, 2)
+        await service.close()
+
+    async def test_embed_shrinks_batches_after_errors(self):
+        sizes: list[int] = []
+        paths: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            paths.append(request.url.path)
+            body = json.loads(request.content)
+            if request.url.path == "/api/embed":
+                sizes.append(len(body["input"]))
+                if len(body["input"]) > 2:
+                    return httpx.Response(500, text="model runner timed out")
+                vectors = [fake_vector(t) for t in body["input"]]
+                return httpx.Response(200, json={"embeddings": vectors})
+            return httpx.Response(200, json={"embedding": fake_vector(body["prompt"])})
+
+        service = make_service(handler, batch_size=4, min_batch_size=1)
+        texts = ["a", "bb", "ccc", "dddd"]
+        first = await service.embed(texts)
+        second = await service.embed(texts)
+
+        assert first.tolist() == second.tolist() == [fake_vector(t) for t in texts]
+        assert sizes == [4, 2, 2, 4, 2, 2]
+        assert set(paths) == {"/api/embed"}
+        assert service.limiter.errors == 2
+        await service.close()
+
+    async def test_embed_retries_batch_after_timeout(self):
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            if calls == 1:
+                raise httpx.ReadTimeout("timed out", request=request)
+            body = json.loads(request.content)
+            vectors = [fake_vector(t) for t in body["input"]]
+            return httpx.Response(200, json={"embeddings": vectors})
+
+        service = make_service(handler, batch_size=2, min_batch_size=2)
+        embeddings = await service.embed(["a", "bb"])
+
+        assert embeddings.tolist() == [fake_vector("a"), fake_vector("bb")]
+        assert calls == 2
+        assert service.limiter.errors == 1
+        assert service._batch_api_supported
+        await service.close()
+
+    async def test_embed_reports_rows_that_fail_after_retries(self):
+        paths: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            paths.append(request.url.path)
+            body = json.loads(request.content)
+            if "bad" in body["input"]:
+                return httpx.Response(503, text="server overloaded")
+            vectors = [fake_vector(t) for t in body["input"]]
+            return httpx.Response(200, json={"embeddings": vectors})
+
+        service = make_service(handler, batch_size=2, min_batch_size=2)
+        with pytest.raises(EmbeddingError) as excinfo:
+            await service.embed(["a", "bb", "bad", "ccc"])
+
+        assert excinfo.value.failed.tolist() == [False, False, True, True]
+        assert excinfo.value.embeddings[:2].tolist() == [fake_vector("a"), fake_vector("bb")]
+        assert paths == ["/api/embed"] * (service.batch_retries + 2)
+        await service.close()
+
+    async def test_embed_reports_missing_single_vectors(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            body = json.loads(request.content)
+            if body["prompt"] == "bad":
+                return httpx.Response(200, json={"error": "model not loaded"})
+            return httpx.Response(200, json={"embedding": fake_vector(body["prompt"])})
+
+        service = make_service(handler, use_batch_api=False)
+        with pytest.raises(EmbeddingError) as excinfo:
+            await service.embed(["x", "bad"])
+
+        assert excinfo.value.failed.tolist() == [False, True]
+        await service.close()
+
+    async def test_embed_falls_back_for_old_servers(self):
+        paths: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            paths.append(request.url.path)
+            if request.url.path == "/api/embed":
+                return httpx.Response(404, text="404 page not found")
+            body = json.loads(request.content)
+            return httpx.Response(200, json={"embedding": fake_vector(body["prompt"])})
+
+        service = make_service(handler, batch_size=2)
+        texts = ["a", "bb", "ccc"]
+        embeddings = await service.embed(texts)
+
+        assert embeddings.tolist() == [fake_vector(t) for t in texts]
+        assert paths.count("/api/embed") == 1
+        assert paths.count("/api/embeddings") == 3
+        await service.close()
+
+    async def test_embed_one_zero_fills_missing_vector(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"error": "model not loaded"})
+
+        service = make_service(handler, use_batch_api=False, json_codec="json")
+        embedding = await service.embed_single("x")
+
+        assert embedding.tolist() == [0.0, 0.0]
+        await service.close()
+
+    async def test_embed_batch_api_disabled(self):
+        paths: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            paths.append(request.url.path)
+            body = json.loads(request.content)
+            return httpx.Response(200, json={"embedding": fake_vector(body["prompt"])})
+
+        service = make_service(handler, use_batch_api=False)
+        embeddings = await service.embed(["x", "yy"])
+
+        assert embeddings.tolist() == [fake_vector("x"), fake_vector("yy")]
+        assert set(paths) == {"/api/embeddings"}
+        await service.close()
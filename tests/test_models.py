@@ -1,3 +1,4 @@
+import numpy as np
 import pytest
 from maomao.models import (
     KnowledgeScope,
@@ -5,10 +6,20 @@ from maomao.models import (
     SourceType,
     ChunkLocation,
     SearchResult,
+    make_chunk_id,
 )
 
 
 class TestChunkLocation:
+    def test_chunk_location_validates_and_dumps(self):
+        location = ChunkLocation(start_line="2", end_line=3)
+        assert location.model_dump() == {
+            "start_line": 2,
+            "end_line": 3,
+            "char_start": 0,
+            "char_end": 0,
+        }
+
     def test_chunk_location_defaults(self):
         location = ChunkLocation()
         assert location.start_line == 0
@@ -73,7 +84,9 @@ class TestKnowledgeChunk:
             source_id="test-id",
             embedding=[0.1, 0.2, 0.3],
         )
-        assert chunk.embedding == [0.1, 0.2, 0.3]
+        assert chunk.embedding.dtype == np.float32
+        assert chunk.embedding.tolist() == pytest.approx([0.1, 0.2, 0.3])
+        assert chunk.model_dump()["embedding"] == pytest.approx([0.1, 0.2, 0.3])
 
     def test_knowledge_chunk_with_location(self):
         location = ChunkLocation(start_line=5, end_line=10, char_start=50, char_end=100)
@@ -88,6 +101,32 @@ class TestKnowledgeChunk:
         assert chunk.location.start_line == 5
         assert chunk.location.end_line == 10
 
+    def test_knowledge_chunk_validates_location_dict(self):
+        chunk = KnowledgeChunk(
+            content="test content",
+            source_type="test",
+            source_path="/test/path",
+            source_id="test-id",
+            location={"start_line": "3", "end_line": 4},
+        )
+        assert chunk.location == ChunkLocation(start_line=3, end_line=4)
+        assert chunk.model_dump()["location"] == {
+            "start_line": 3,
+            "end_line": 4,
+            "char_start": 0,
+            "char_end": 0,
+        }
+
+    def test_knowledge_chunk_rejects_bad_embedding(self):
+        with pytest.raises(ValueError):
+            KnowledgeChunk(
+                content="test content",
+                source_type="test",
+                source_path="/test/path",
+                source_id="test-id",
+                embedding=["not a float"],
+            )
+
 
 class TestSearchResult:
     def test_search_result_defaults(self):
@@ -124,3 +163,19 @@ class TestSourceType:
     def test_source_type_values(self):
         assert SourceType.SIYUAN.value == "siyuan"
         assert SourceType.LOCAL_DOC.value == "local_doc"
+
+
+class TestMakeChunkId:
+    def test_chunk_id_is_deterministic(self):
+        first = make_chunk_id("local_doc", "/docs/a.md", "abc123", 0)
+        second = make_chunk_id("local_doc", "/docs/a.md", "abc123", 0)
+        assert first == second
+        assert len(first) == 36
+
+    def test_chunk_id_depends_on_identity(self):
+        base = make_chunk_id("local_doc", "/docs/a.md", "abc123", 0)
+        assert make_chunk_id("local_doc", "/docs/b.md", "abc123", 0) != base
+        assert make_chunk_id("local_doc", "/docs/a.md", "def456", 0) != base
+        assert make_chunk_id("local_doc", "/docs/a.md", "abc123", 1) != base
+        assert make_chunk_id("siyuan", "/docs/a.md", "abc123", 0) != base
+        assert make_chunk_id("local_doc", "/docs/a.md", "abc123", 0, "project", "p1") != base
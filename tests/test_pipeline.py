@@ -0,0 +1,454 @@
+import numpy as np
+import pytest
+from maomao import pipeline as pipeline_module
+from maomao.concurrency import AdaptiveLimiter
+from maomao.config import (
+    ChunkCacheConfig,
+    EmbeddingCacheConfig,
+    IncrementalConfig,
+    OllamaConfig,
+    PipelineConfig,
+    Settings,
+    SourceConfig,
+)
+from maomao.embeddings import EmbeddingError, EmbeddingService
+from maomao.models import ChunkLocation
+from maomao.pipeline import IngestionPipeline
+from maomao.sources import LocalDocSource
+
+
+class FakeEmbeddingService(EmbeddingService):
+    def __init__(self):
+        self.calls: list[list[str]] = []
+        self.failing: set[str] = set()
+        self.limiter = AdaptiveLimiter(max_concurrency=3, max_batch_size=4, adaptive=False)
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(texts)
+        vectors = [[float(len(t)), 1.0] for t in texts]
+        failed = np.array([any(f in t for f in self.failing) for t in texts])
+        if failed.any():
+            raise EmbeddingError("embedding failed", np.array(vectors, dtype=np.float32), failed)
+        return vectors
+
+    async def embed_single(self, text: str) -> list[float]:
+        return (await self.embed([text]))[0]
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeVectorStore:
+    def __init__(self, config, embedding_dim: int = 1024):
+        self.points: dict[str, object] = {}
+        self.upsert_calls = 0
+
+    def ensure_collection(self) -> None:
+        pass
+
+    def upsert_chunks(self, chunks) -> None:
+        self.upsert_calls += 1
+        for chunk in chunks:
+            if chunk.embedding is not None:
+                self.points[chunk.id] = chunk
+
+    def update_payloads(self, chunks) -> None:
+        for chunk in chunks:
+            self.points[chunk.id].location = chunk.location
+
+    def delete_chunks(self, chunk_ids: list[str]) -> None:
+        for chunk_id in chunk_ids:
+            self.points.pop(chunk_id, None)
+
+    def delete_by_source_ids(self, source_ids: list[str]) -> int:
+        doomed = [pid for pid, c in self.points.items() if c.source_id in source_ids]
+        self.delete_chunks(doomed)
+        return len(doomed)
+
+    def count(self) -> int:
+        return len(self.points)
+
+
+@pytest.fixture
+def docs_dir(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(12):
+        (docs / f"doc{i}.md").write_text(
+            f"# Doc {i}\n\n"
+            f"## Part A\n\nThe first section of document number {i} talks about apples.\n\n"
+            f"## Part B\n\nThe second section of document number {i} talks about pears.\n"
+        )
+    return docs
+
+
+@pytest.fixture
+def settings(tmp_path, docs_dir):
+    return Settings(
+        sources=[SourceConfig(type="local_doc", config={"path": str(docs_dir)})],
+        ollama=OllamaConfig(embedding_dim=2, batch_size=4),
+        incremental=IncrementalConfig(state_file=str(tmp_path / "state.json")),
+        embedding_cache=EmbeddingCacheConfig(path=str(tmp_path / "embeddings.db")),
+        chunk_cache=ChunkCacheConfig(path=str(tmp_path / "chunks.db")),
+        pipeline=PipelineConfig(queue_size=2, chunk_concurrency=2, embed_concurrency=2),
+    )
+
+
+@pytest.fixture
+def fake_services(monkeypatch):
+    service = FakeEmbeddingService()
+    store = FakeVectorStore(None)
+
+    async def get_service(config):
+        return service
+
+    monkeypatch.setattr(pipeline_module, "get_embedding_service", get_service)
+    monkeypatch.setattr(pipeline_module, "VectorStore", lambda config, dim: store)
+    return service
+
+
+@pytest.mark.asyncio
+class TestIngestionPipeline:
+    async def test_full_ingest_streams_all_chunks(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            result = await pipeline.run_full_ingest()
+
+            assert result.errors == []
+            assert result.total_chunks == 24
+            assert result.new_chunks == 24
+            assert pipeline.vector_store.count() == 24
+            assert pipeline.vector_store.upsert_calls > 1
+            assert all(len(texts) <= 4 for texts in fake_services.calls)
+            assert (result.embed_concurrency, result.embed_batch_size) == (3, 4)
+
+            state = pipeline.source_state(pipeline.sources[0])
+            assert state["count"] == 12
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_stores_plain_chunk_records(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+
+            for chunk in pipeline.vector_store.points.values():
+                assert type(chunk.metadata) is dict
+                assert isinstance(chunk.location, ChunkLocation)
+        finally:
+            await pipeline.close()
+
+    async def test_chunks_hold_float32_rows_of_the_batch(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+
+            for chunk in pipeline.vector_store.points.values():
+                assert chunk.embedding.dtype == np.float32
+                assert chunk.embedding.base is not None
+                assert chunk.embedding.tolist() == [float(len(chunk.content)), 1.0]
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_reuses_cached_embeddings(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            fake_services.calls.clear()
+
+            result = await pipeline.run_full_ingest()
+
+            assert fake_services.calls == []
+            assert result.cache_hits == 24
+            assert result.cache_misses == 0
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_reuses_cached_chunk_manifests(
+        self, settings, fake_services, monkeypatch
+    ):
+        pipeline = IngestionPipeline(settings)
+        try:
+            first = await pipeline.run_full_ingest()
+            chunker = pipeline._get_chunker("markdown")
+
+            def fail(*args, **kwargs):
+                raise AssertionError("chunker should not run on a cache hit")
+
+            monkeypatch.setattr(chunker, "chunk", fail)
+            second = await pipeline.run_full_ingest()
+
+            assert second.errors == []
+            assert second.total_chunks == first.total_chunks
+            assert pipeline.chunk_cache.hits == 12
+            assert pipeline.vector_store.count() == 24
+        finally:
+            await pipeline.close()
+
+    async def test_chunk_cache_hits_after_documents_move(
+        self, tmp_path, settings, fake_services, docs_dir, monkeypatch
+    ):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+        finally:
+            await pipeline.close()
+
+        moved = docs_dir.rename(tmp_path / "moved")
+        settings.sources = [SourceConfig(type="local_doc", config={"path": str(moved)})]
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.initialize()
+            monkeypatch.setattr(pipeline._get_chunker("markdown"), "chunk", None)
+            result = await pipeline.run_full_ingest()
+
+            assert result.errors == []
+            assert pipeline.chunk_cache.hits == 12
+            moved_chunks = [
+                c for c in pipeline.vector_store.points.values() if c.source_id.startswith(str(moved))
+            ]
+            assert len(moved_chunks) == 24
+            assert all(c.metadata["base_path"] == str(moved) for c in moved_chunks)
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_is_idempotent(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            first_ids = set(pipeline.vector_store.points)
+
+            await pipeline.run_full_ingest()
+
+            assert set(pipeline.vector_store.points) == first_ids
+            assert pipeline.vector_store.count() == 24
+        finally:
+            await pipeline.close()
+
+    async def test_incremental_only_embeds_changed_chunks(self, settings, fake_services, docs_dir):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            fake_services.calls.clear()
+
+            doc = docs_dir / "doc3.md"
+            doc.write_text(
+                doc.read_text().replace("talks about pears", "talks about plums, not pears")
+            )
+            result = await pipeline.run_incremental_ingest()
+
+            assert result.errors == []
+            assert fake_services.calls == [
+                ["## Part B\n\nThe second section of document number 3 talks about plums, not pears."]
+            ]
+            assert result.updated_chunks == 1
+            assert result.deleted_chunks == 1
+            assert pipeline.vector_store.count() == 24
+
+            state = pipeline.source_state(pipeline.sources[0])
+            assert set(state["files"][str(doc)]["chunks"]) == {
+                c.id for c in pipeline.vector_store.points.values() if c.source_id == str(doc)
+            }
+        finally:
+            await pipeline.close()
+
+    async def test_incremental_does_not_rescan(self, settings, fake_services, docs_dir, monkeypatch):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            before = pipeline.source_state(pipeline.sources[0])
+
+            async def no_scan(self):
+                raise AssertionError("incremental ingest must not rescan")
+
+            monkeypatch.setattr(LocalDocSource, "scan", no_scan)
+            (docs_dir / "doc0.md").unlink()
+            (docs_dir / "new.md").write_text("## New\n\nA brand new document that is long enough to chunk.\n")
+
+            result = await pipeline.run_incremental_ingest()
+
+            assert result.errors == []
+            state = pipeline.source_state(pipeline.sources[0])
+            assert set(state["files"]) == set(before["files"]) - {str(docs_dir / "doc0.md")} | {
+                str(docs_dir / "new.md")
+            }
+            assert state["count"] == 12
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_removes_stale_chunks(self, settings, fake_services, docs_dir):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            (docs_dir / "doc0.md").unlink()
+            doc = docs_dir / "doc1.md"
+            doc.write_text(doc.read_text().replace("apples", "oranges"))
+
+            result = await pipeline.run_full_ingest()
+
+            assert result.deleted_chunks == 3
+            assert pipeline.vector_store.count() == 22
+        finally:
+            await pipeline.close()
+
+    async def test_full_ingest_replaces_points_without_manifest(self, settings, fake_services):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            source = pipeline.sources[0]
+            state = pipeline.source_state(source)
+            for entry in state["files"].values():
+                del entry["chunks"]
+            pipeline.state_manager.update_source_state(source.state_key(), state)
+            pipeline.state_manager.save_state()
+            points = pipeline.vector_store.points
+            legacy = {f"legacy-{i}": c for i, c in enumerate(points.values()) if i % 2 == 0}
+            points.update({pid: c.model_copy(update={"id": pid}) for pid, c in legacy.items()})
+            assert pipeline.vector_store.count() == 36
+
+            result = await pipeline.run_full_ingest()
+
+            assert result.errors == []
+            assert result.deleted_chunks == 36
+            assert pipeline.vector_store.count() == 24
+            assert not any(pid.startswith("legacy-") for pid in pipeline.vector_store.points)
+            assert all(e["chunks"] for e in pipeline.source_state(source)["files"].values())
+        finally:
+            await pipeline.close()
+
+    async def test_sources_of_one_type_keep_separate_state(
+        self, tmp_path, settings, fake_services, docs_dir
+    ):
+        notes = tmp_path / "notes"
+        notes.mkdir()
+        for i in range(3):
+            (notes / f"note{i}.md").write_text(
+                f"## Note {i}\n\nA note long enough to be kept as a chunk of its own.\n"
+            )
+        settings.sources.append(SourceConfig(type="local_doc", config={"path": str(notes)}))
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            assert pipeline.vector_store.count() == 27
+
+            result = await pipeline.run_full_ingest()
+            assert result.deleted_chunks == 0
+            assert pipeline.vector_store.count() == 27
+            assert [pipeline.source_state(s)["count"] for s in pipeline.sources] == [12, 3]
+        finally:
+            await pipeline.close()
+
+    async def test_incremental_keeps_sources_of_one_type_apart(
+        self, tmp_path, settings, fake_services, docs_dir
+    ):
+        notes = tmp_path / "notes"
+        notes.mkdir()
+        (notes / "note.md").write_text("## Note\n\nA note long enough to be kept as a chunk.\n")
+        settings.sources.append(SourceConfig(type="local_doc", config={"path": str(notes)}))
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            fake_services.calls.clear()
+            (docs_dir / "doc0.md").unlink()
+
+            result = await pipeline.run_incremental_ingest()
+            assert (result.new_chunks, result.updated_chunks, result.deleted_chunks) == (0, 0, 2)
+            assert fake_services.calls == []
+
+            result = await pipeline.run_incremental_ingest()
+            assert (result.new_chunks, result.updated_chunks, result.deleted_chunks) == (0, 0, 0)
+            assert pipeline.vector_store.count() == 23
+        finally:
+            await pipeline.close()
+
+    async def test_adopts_state_keyed_by_source_type(self, settings, fake_services, docs_dir):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            source = pipeline.sources[0]
+            legacy = pipeline.state_manager.get_source_state(source.state_key())
+            pipeline.state_manager.remove_source_state(source.state_key())
+            pipeline.state_manager.update_source_state("local_doc", legacy)
+            pipeline.state_manager.save_state()
+            (docs_dir / "doc0.md").unlink()
+
+            result = await pipeline.run_incremental_ingest()
+
+            assert result.deleted_chunks == 2
+            assert pipeline.vector_store.count() == 22
+            assert "local_doc" not in pipeline.state_manager.state.source_states
+            assert pipeline.source_state(source)["count"] == 11
+        finally:
+            await pipeline.close()
+
+    async def test_entries_without_manifest_keep_clearing_old_points(
+        self, settings, fake_services, docs_dir
+    ):
+        pipeline = IngestionPipeline(settings)
+        try:
+            await pipeline.run_full_ingest()
+            doc = docs_dir / "doc0.md"
+            source = pipeline.sources[0]
+            state = pipeline.source_state(source)
+            for entry in state["files"].values():
+                del entry["chunks"]
+            pipeline.state_manager.update_source_state(source.state_key(), state)
+            pipeline.state_manager.save_state()
+            old = next(c for c in pipeline.vector_store.points.values() if c.source_id == str(doc))
+            pipeline.vector_store.points["legacy"] = old.model_copy(update={"id": "legacy"})
+
+            result = await pipeline.run_incremental_ingest()
+            source = pipeline.sources[0]
+            assert result.deleted_chunks == 0
+            assert "chunks" not in pipeline.source_state(source)["files"][str(doc)]
+
+            doc.write_text(doc.read_text().replace("apples", "oranges"))
+            result = await pipeline.run_incremental_ingest()
+
+            assert result.deleted_chunks == 3
+            assert "legacy" not in pipeline.vector_store.points
+            assert pipeline.vector_store.count() == 24
+            assert pipeline.source_state(source)["files"][str(doc)]["chunks"]
+        finally:
+            await pipeline.close()
+
+    async def test_failed_embeddings_are_retried_next_run(self, settings, fake_services, docs_dir):
+        failing = "document number 5 talks about pears"
+        fake_services.failing.add(failing)
+        pipeline = IngestionPipeline(settings)
+        try:
+            result = await pipeline.run_full_ingest()
+
+            doc = str(docs_dir / "doc5.md")
+            assert result.errors == ["embedding failed"]
+            assert pipeline.vector_store.count() == 23
+            assert not any(failing in c.content for c in pipeline.vector_store.points.values())
+            entry = pipeline.source_state(pipeline.sources[0])["files"][doc]
+            assert "hash" not in entry
+            assert entry["chunks"] == [
+                c.id for c in pipeline.vector_store.points.values() if c.source_id == doc
+            ]
+
+            fake_services.failing.clear()
+            fake_services.calls.clear()
+            result = await pipeline.run_incremental_ingest()
+
+            assert result.errors == []
+            assert [len(call) for call in fake_services.calls] == [1]
+            assert failing in fake_services.calls[0][0]
+            assert pipeline.vector_store.count() == 24
+            assert len(pipeline.source_state(pipeline.sources[0])["files"][doc]["chunks"]) == 2
+        finally:
+            await pipeline.close()
+
+    async def test_stage_errors_are_reported(self, settings, fake_services, monkeypatch):
+        def broken_upsert(self, chunks):
+            raise RuntimeError("qdrant unavailable")
+
+        monkeypatch.setattr(FakeVectorStore, "upsert_chunks", broken_upsert)
+        pipeline = IngestionPipeline(settings)
+        try:
+            result = await pipeline.run_full_ingest()
+            assert result.errors == ["qdrant unavailable"]
+        finally:
+            await pipeline.close()
@@ -1,5 +1,16 @@
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import httpx
 import pytest
+from maomao.sources import base as sources_base
 from maomao.sources.base import SourceItem, SourceChange, KnowledgeSource, SourceRegistry
+from maomao.sources.local_doc import LocalDocSource
+from maomao.sources.siyuan import SiyuanSource
 
 
 class MockSource(KnowledgeSource):
@@ -34,6 +45,33 @@ class TestSourceItem:
         assert item.chunker_type == "text"
         assert item.metadata == {}
 
+    def test_source_item_is_slotted_and_keeps_constructor_args(self):
+        item = SourceItem(content="test")
+        assert not hasattr(item, "__dict__")
+        assert item.id == item.id
+        assert SourceItem().id != item.id
+
+        created = datetime(2024, 1, 1)
+        updated = datetime(2024, 6, 1)
+        item = SourceItem(id="fixed", created_at=created, updated_at=updated)
+        assert (item.id, item.created_at, item.updated_at) == ("fixed", created, updated)
+
+    def test_source_item_timestamps_are_filled_on_first_read(self, monkeypatch):
+        calls: list[datetime] = []
+
+        class CountingDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                calls.append(datetime.now(tz))
+                return calls[-1]
+
+        monkeypatch.setattr(sources_base, "datetime", CountingDatetime)
+        item = SourceItem(content="test")
+        assert calls == []
+
+        assert item.updated_at == item.created_at == calls[0]
+        assert len(calls) == 1
+
     def test_source_item_with_scope(self):
         item = SourceItem(
             content="test content",
@@ -132,3 +170,530 @@ class TestSourceRegistry:
 
     def test_create_nonexistent_source(self):
         assert SourceRegistry.create("nonexistent", {}) is None
+
+
+def _age(path, seconds: int = 60) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.mark.asyncio
+class TestLocalDocSourceChanges:
+    async def _state_for(self, source):
+        items = await source.scan()
+        return {
+            "files": {item.source_id: {**item.state, "hash": item.content_hash} for item in items}
+        }
+
+    async def test_unchanged_stat_skips_hashing(self, tmp_path, monkeypatch):
+        doc = tmp_path / "a.md"
+        doc.write_text("# A\n\nSome content.")
+        _age(doc)
+        source = LocalDocSource(path=str(tmp_path))
+        state = await self._state_for(source)
+        assert state["files"][str(doc)]["size"] == doc.stat().st_size
+
+        def fail_read(self, file_path, known_hash=""):
+            raise AssertionError("unchanged files must not be read")
+
+        monkeypatch.setattr(LocalDocSource, "_read_file", fail_read)
+        changes = await source.get_changes(state)
+        assert changes.added == []
+        assert changes.updated == []
+        assert changes.deleted_ids == []
+
+    async def test_paranoid_mode_hashes_everything(self, tmp_path, monkeypatch):
+        doc = tmp_path / "a.md"
+        doc.write_text("# A\n\nSome content.")
+        _age(doc)
+        source = LocalDocSource(path=str(tmp_path), paranoid=True)
+        state = await self._state_for(source)
+
+        hashed: list[str] = []
+        original = LocalDocSource._read_file
+
+        def counting_read(self, file_path, known_hash=""):
+            hashed.append(str(file_path))
+            return original(self, file_path, known_hash)
+
+        monkeypatch.setattr(LocalDocSource, "_read_file", counting_read)
+        changes = await source.get_changes(state)
+        assert hashed == [str(doc)]
+        assert changes.updated == []
+
+    async def test_touched_file_is_refreshed_not_updated(self, tmp_path):
+        doc = tmp_path / "a.md"
+        doc.write_text("# A\n\nSome content.")
+        _age(doc, 120)
+        source = LocalDocSource(path=str(tmp_path))
+        state = await self._state_for(source)
+
+        _age(doc, 60)
+        changes = await source.get_changes(state)
+        assert changes.updated == []
+        assert changes.refreshed[str(doc)]["mtime_ns"] == doc.stat().st_mtime_ns
+
+    async def test_modified_file_is_updated(self, tmp_path):
+        doc = tmp_path / "a.md"
+        doc.write_text("# A\n\nSome content.")
+        _age(doc, 120)
+        source = LocalDocSource(path=str(tmp_path))
+        state = await self._state_for(source)
+
+        doc.write_text("# A\n\nOther content!")
+        _age(doc, 60)
+        changes = await source.get_changes(state)
+        assert [item.source_id for item in changes.updated] == [str(doc)]
+
+
+class TestLocalDocSourceScanFiles:
+    def _tree(self, root):
+        for rel in [
+            "README.md",
+            "notes.txt",
+            "image.png",
+            "docs/guide.md",
+            "docs/deep/api.rst",
+            "node_modules/pkg/README.md",
+            "sub/.git/info.md",
+            "sub/target/out.md",
+            "logs/run.md",
+        ]:
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("content")
+
+    def test_scan_matches_patterns_and_prunes_skip_dirs(self, tmp_path, monkeypatch):
+        self._tree(tmp_path)
+        visited: list[str] = []
+        real_scandir = os.scandir
+
+        def recording_scandir(path):
+            visited.append(os.path.relpath(path, tmp_path))
+            return real_scandir(path)
+
+        monkeypatch.setattr(os, "scandir", recording_scandir)
+        source = LocalDocSource(path=str(tmp_path))
+        files = [str(p.relative_to(tmp_path)) for p in source._scan_files(tmp_path)]
+
+        assert files == [
+            "README.md",
+            "docs/deep/api.rst",
+            "docs/guide.md",
+            "logs/run.md",
+            "notes.txt",
+        ]
+        assert len(visited) == len(set(visited))
+        assert not any("node_modules" in v or ".git" in v or "target" in v for v in visited)
+
+    def test_scan_non_recursive(self, tmp_path):
+        self._tree(tmp_path)
+        source = LocalDocSource(path=str(tmp_path), recursive=False)
+        files = [p.name for p in source._scan_files(tmp_path)]
+        assert files == ["README.md", "notes.txt"]
+
+    def test_scan_path_patterns(self, tmp_path):
+        self._tree(tmp_path)
+        source = LocalDocSource(path=str(tmp_path), patterns=["docs/*.md"])
+        files = [str(p.relative_to(tmp_path)) for p in source._scan_files(tmp_path)]
+        assert files == ["docs/guide.md"]
+
+    def _glob_tree(self, root):
+        for rel in ["top.md", "sub/a.md", "sub/a.txt", "sub/deeper/b.md", "x/sub/c.md"]:
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("content")
+
+    def test_scan_double_star_matches_top_level(self, tmp_path):
+        self._glob_tree(tmp_path)
+        source = LocalDocSource(path=str(tmp_path), patterns=["**/*.md"])
+        files = [p.relative_to(tmp_path).as_posix() for p in source._scan_files(tmp_path)]
+
+        assert files == ["sub/a.md", "sub/deeper/b.md", "top.md", "x/sub/c.md"]
+        assert files == sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("**/*.md"))
+
+    def test_scan_relative_path_pattern_matches_any_depth(self, tmp_path):
+        self._glob_tree(tmp_path)
+        source = LocalDocSource(path=str(tmp_path), patterns=["sub/*.md"])
+        files = [p.relative_to(tmp_path).as_posix() for p in source._scan_files(tmp_path)]
+
+        assert files == ["sub/a.md", "x/sub/c.md"]
+        assert files == sorted(p.relative_to(tmp_path).as_posix() for p in tmp_path.rglob("sub/*.md"))
+
+    def test_scan_anchored_path_pattern(self, tmp_path):
+        self._glob_tree(tmp_path)
+        source = LocalDocSource(path=str(tmp_path), patterns=["/sub/**/*.md"])
+        files = [p.relative_to(tmp_path).as_posix() for p in source._scan_files(tmp_path)]
+
+        assert files == ["sub/a.md", "sub/deeper/b.md"]
+
+    def test_scan_respects_gitignore(self, tmp_path):
+        pytest.importorskip("pathspec")
+        self._tree(tmp_path)
+        (tmp_path / ".gitignore").write_text("logs/\nnotes.txt\n")
+        (tmp_path / "docs" / ".gitignore").write_text("deep/\n")
+
+        source = LocalDocSource(path=str(tmp_path), respect_gitignore=True)
+        files = [str(p.relative_to(tmp_path)) for p in source._scan_files(tmp_path)]
+        assert files == ["README.md", "docs/guide.md"]
+
+
+@pytest.mark.asyncio
+class TestLocalDocSourceReading:
+    async def test_file_read_once(self, tmp_path, monkeypatch):
+        doc = tmp_path / "a.md"
+        doc.write_text("# A\n\nSome content.")
+        opened: list[str] = []
+        real_open = open
+
+        def recording_open(path, *args, **kwargs):
+            opened.append(str(path))
+            return real_open(path, *args, **kwargs)
+
+        monkeypatch.setattr("builtins.open", recording_open)
+        items = await LocalDocSource(path=str(tmp_path)).scan()
+
+        assert len(items) == 1
+        assert opened.count(str(doc)) == 1
+
+    async def test_hash_algorithms(self, tmp_path):
+        doc = tmp_path / "a.txt"
+        doc.write_text("Some content.")
+
+        hashes = set()
+        for algorithm in ("blake2b", "sha256"):
+            items = await LocalDocSource(path=str(tmp_path), hash_algorithm=algorithm).scan()
+            assert len(items[0].content_hash) == 16
+            hashes.add(items[0].content_hash)
+        assert len(hashes) == 2
+
+    async def test_normalizes_newlines(self, tmp_path):
+        (tmp_path / "a.txt").write_bytes(b"line one\r\nline two\rline three")
+        items = await LocalDocSource(path=str(tmp_path)).scan()
+        assert items[0].content == "line one\nline two\nline three"
+
+    async def test_frontmatter(self, tmp_path):
+        (tmp_path / "a.md").write_text("---\ntitle: Hello\n---\n# Body\n")
+        (tmp_path / "b.md").write_text("# Plain\n\ntitle: not frontmatter\n")
+        items = {i.metadata["filename"]: i for i in await LocalDocSource(path=str(tmp_path)).scan()}
+
+        assert items["a.md"].metadata["title"] == "Hello"
+        assert items["a.md"].content == "# Body"
+        assert "title" not in items["b.md"].metadata
+
+    async def test_large_files_use_mmap(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(LocalDocSource, "MMAP_THRESHOLD", 16)
+        (tmp_path / "big.txt").write_text("x" * 100 + "\n\n" + "y" * 100)
+        (tmp_path / "small.txt").write_text("tiny")
+
+        source = LocalDocSource(path=str(tmp_path))
+        items = {i.metadata["filename"]: i for i in await source.scan()}
+
+        assert items["big.txt"].content == "x" * 100 + "\n\n" + "y" * 100
+        assert items["big.txt"].content_hash == source._hash_bytes(
+            (tmp_path / "big.txt").read_bytes()
+        )
+        assert items["small.txt"].content == "tiny"
+
+    async def test_scan_with_bounded_workers(self, tmp_path):
+        for i in range(25):
+            (tmp_path / f"doc{i:02d}.txt").write_text(f"document {i}")
+
+        source = LocalDocSource(path=str(tmp_path), io_workers=2)
+        try:
+            items = await source.scan()
+        finally:
+            await source.close()
+
+        assert [item.content for item in items] == [f"document {i}" for i in range(25)]
+
+    async def test_scan_with_process_pool(self, tmp_path):
+        for i in range(5):
+            (tmp_path / f"doc{i}.md").write_text(f"---\nindex: {i}\n---\n# Doc {i}\n")
+
+        source = LocalDocSource(path=str(tmp_path), process_workers=2)
+        try:
+            items = await source.scan()
+            changes = await source.get_changes({})
+        finally:
+            await source.close()
+
+        assert [item.metadata["index"] for item in items] == list(range(5))
+        assert len(changes.added) == 5
+
+    async def test_in_flight_reads_follow_process_pool_size(self, tmp_path, monkeypatch):
+        files = []
+        for i in range(20):
+            files.append(tmp_path / f"doc{i:02d}.txt")
+            files[-1].write_text(f"document {i}")
+
+        loop = asyncio.get_running_loop()
+        submitted = []
+        run_in_executor = loop.run_in_executor
+
+        def counting_run_in_executor(executor, func, *args):
+            submitted.append(args[0])
+            return run_in_executor(executor, func, *args)
+
+        monkeypatch.setattr(loop, "run_in_executor", counting_run_in_executor)
+        source = LocalDocSource(path=str(tmp_path), io_workers=16, process_workers=2)
+        loaded = source._load_items(files, tmp_path, {})
+        try:
+            await anext(loaded)
+            assert len(submitted) <= 2 * 2 + 1
+            remaining = [path async for path, _ in loaded]
+        finally:
+            await loaded.aclose()
+            await source.close()
+
+        assert len(remaining) == 19
+        assert len(submitted) == 20
+
+
+@pytest.mark.asyncio
+class TestLocalDocSourcePathChanges:
+    async def test_path_changes(self, tmp_path):
+        keep = tmp_path / "keep.md"
+        edit = tmp_path / "docs" / "edit.md"
+        gone = tmp_path / "gone.md"
+        edit.parent.mkdir()
+        for path in (keep, edit, gone):
+            path.write_text(f"# {path.stem}\n\ncontent")
+        source = LocalDocSource(path=str(tmp_path))
+        items = await source.scan()
+        state = {"files": {i.source_id: {**i.state, "hash": i.content_hash} for i in items}}
+
+        edit.write_text("# edit\n\nnew content")
+        gone.unlink()
+        new = tmp_path / "new.md"
+        new.write_text("# new\n\ncontent")
+        (tmp_path / "node_modules").mkdir()
+        (tmp_path / "node_modules" / "skip.md").write_text("# skip")
+        (tmp_path / "image.png").write_text("not a doc")
+
+        changes = await source.get_path_changes(
+            [str(edit), str(gone), str(new), str(keep), str(tmp_path / "node_modules" / "skip.md"),
+             str(tmp_path / "image.png")],
+            state,
+        )
+        await source.close()
+
+        assert [i.source_id for i in changes.added] == [str(new)]
+        assert [i.source_id for i in changes.updated] == [str(edit)]
+        assert changes.deleted_ids == [str(gone)]
+
+    async def test_deleted_directory_removes_its_files(self, tmp_path):
+        (tmp_path / "docs").mkdir()
+        (tmp_path / "docs" / "a.md").write_text("# a")
+        (tmp_path / "docs" / "b.md").write_text("# b")
+        (tmp_path / "other.md").write_text("# other")
+        source = LocalDocSource(path=str(tmp_path))
+        items = await source.scan()
+        state = {"files": {i.source_id: {"hash": i.content_hash} for i in items}}
+
+        for child in (tmp_path / "docs").iterdir():
+            child.unlink()
+        (tmp_path / "docs").rmdir()
+
+        changes = await source.get_path_changes([str(tmp_path / "docs")], state)
+        await source.close()
+        assert changes.deleted_ids == [str(tmp_path / "docs" / "a.md"), str(tmp_path / "docs" / "b.md")]
+
+
+class FakeSiyuan:
+    def __init__(self, docs: dict[str, str], failures: int = 0):
+        self.docs = docs
+        self.updated = dict.fromkeys(docs, "20240101000000")
+        self.failures = failures
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.export_calls = 0
+        self.sql_calls = 0
+        self.statements: list[str] = []
+
+    def edit(self, doc_id: str, content: str, updated: str) -> None:
+        self.docs[doc_id] = content
+        self.updated[doc_id] = updated
+
+    def delete(self, doc_id: str) -> None:
+        del self.docs[doc_id]
+        del self.updated[doc_id]
+
+    def query(self, stmt: str) -> list[dict]:
+        rows = [
+            {
+                "id": doc_id,
+                "hpath": f"/{doc_id}",
+                "box": "box",
+                "content": doc_id,
+                "updated": self.updated[doc_id],
+            }
+            for doc_id in self.docs
+        ]
+        if match := re.search(r"updated >= '(\d+)'", stmt):
+            rows = [row for row in rows if row["updated"] >= match.group(1)]
+        if match := re.search(r"id > '(\w*)'", stmt):
+            rows = sorted(
+                (row for row in rows if row["id"] > match.group(1)), key=lambda row: row["id"]
+            )
+        if match := re.search(r"LIMIT (\d+)", stmt):
+            rows = rows[: int(match.group(1))]
+        if stmt.startswith("SELECT id FROM"):
+            rows = [{"id": row["id"]} for row in rows]
+        return rows
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        if request.url.path == "/api/query/sql":
+            self.sql_calls += 1
+            self.statements.append(payload["stmt"])
+            return httpx.Response(200, json={"code": 0, "data": self.query(payload["stmt"])})
+
+        self.export_calls += 1
+        if self.failures:
+            self.failures -= 1
+            return httpx.Response(503)
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        doc_id = payload["id"]
+        await asyncio.sleep(0.001 * (len(self.docs) - int(doc_id[1:])))
+        self.in_flight -= 1
+        return httpx.Response(200, json={"code": 0, "data": {"content": self.docs[doc_id]}})
+
+    def source(self, **kwargs) -> SiyuanSource:
+        source = SiyuanSource(box_id="box", retry_backoff=0, **kwargs)
+        source._client = httpx.AsyncClient(
+            base_url=source.api_url, transport=httpx.MockTransport(self.handler)
+        )
+        return source
+
+
+@pytest.mark.asyncio
+class TestSiyuanSourceScan:
+    async def test_scan_keeps_block_order(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(20)})
+        source = fake.source(concurrency=4)
+
+        items = await source.scan()
+        await source.close()
+
+        assert [item.source_id for item in items] == sorted(f"d{i}" for i in range(20))
+        assert items[3].content == "# Doc 11"
+
+    async def test_scan_pages_block_listing(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(10)})
+        source = fake.source(page_size=3)
+
+        items = await source.scan()
+        await source.close()
+
+        assert len(items) == 10
+        assert fake.sql_calls == 4
+        assert all(not stmt.startswith("SELECT *") for stmt in fake.statements)
+        assert all("LIMIT 3" in stmt for stmt in fake.statements)
+
+    async def test_scan_bounds_concurrency(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(20)})
+        source = fake.source(concurrency=3)
+
+        await source.scan()
+        await source.close()
+
+        assert 1 < fake.max_in_flight <= 3
+
+    async def test_scan_retries_transient_errors(self):
+        fake = FakeSiyuan({"d0": "# Doc 0", "d1": "# Doc 1"}, failures=2)
+        source = fake.source(concurrency=1)
+
+        items = await source.scan()
+        await source.close()
+
+        assert [item.source_id for item in items] == ["d0", "d1"]
+        assert fake.export_calls == 4
+
+    async def test_scan_gives_up_after_max_retries(self):
+        fake = FakeSiyuan({"d0": "# Doc 0"}, failures=10)
+        source = fake.source(max_retries=2)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await source.scan()
+        await source.close()
+
+        assert fake.export_calls == 3
+
+
+def siyuan_state(items: list[SourceItem]) -> dict:
+    return {
+        "ids": [item.source_id for item in items],
+        "hashes": {item.source_id: item.content_hash for item in items},
+        "files": {
+            item.source_id: {**item.state, "hash": item.content_hash} for item in items
+        },
+    }
+
+
+@pytest.mark.asyncio
+class TestSiyuanSourceChanges:
+    async def test_noop_sync_exports_nothing(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(5)})
+        source = fake.source()
+        state = siyuan_state(await source.scan())
+        fake.export_calls = fake.sql_calls = 0
+
+        changes = await source.get_changes(state)
+        await source.close()
+
+        assert not (changes.added or changes.updated or changes.deleted_ids)
+        assert fake.export_calls == 0
+        assert fake.sql_calls == 2
+        assert changes.checkpoint == {"last_sync": "20240101000000"}
+
+    async def test_only_changed_documents_are_exported(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(5)})
+        source = fake.source()
+        state = siyuan_state(await source.scan())
+        fake.edit("d2", "# Doc 2 edited", "20240102000000")
+        fake.edit("d5", "# Doc 5", "20240102000000")
+        fake.delete("d4")
+        fake.export_calls = 0
+
+        changes = await source.get_changes(state)
+        await source.close()
+
+        assert [item.source_id for item in changes.updated] == ["d2"]
+        assert [item.source_id for item in changes.added] == ["d5"]
+        assert changes.deleted_ids == ["d4"]
+        assert fake.export_calls == 2
+        assert changes.checkpoint == {"last_sync": "20240102000000"}
+
+    async def test_checkpoint_limits_later_queries(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(3)})
+        source = fake.source()
+        state = siyuan_state(await source.scan())
+        fake.edit("d1", "# Doc 1 edited", "20240102000000")
+        changes = await source.get_changes(state)
+        state = {**changes.checkpoint, **siyuan_state(changes.updated)}
+        state["ids"] = ["d0", "d1", "d2"]
+        fake.export_calls = 0
+
+        changes = await source.get_changes(state)
+        await source.close()
+
+        assert not (changes.added or changes.updated or changes.deleted_ids)
+        assert fake.export_calls == 0
+
+    async def test_state_without_timestamps_is_refreshed(self):
+        fake = FakeSiyuan({f"d{i}": f"# Doc {i}" for i in range(3)})
+        source = fake.source()
+        items = await source.scan()
+        state = {
+            "ids": [item.source_id for item in items],
+            "hashes": {item.source_id: item.content_hash for item in items},
+        }
+
+        changes = await source.get_changes(state)
+        await source.close()
+
+        assert not (changes.added or changes.updated or changes.deleted_ids)
+        assert changes.refreshed == {f"d{i}": {"updated": "20240101000000"} for i in range(3)}
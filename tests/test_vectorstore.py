@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from maomao.config import QdrantConfig
+from maomao.models import ChunkLocation, KnowledgeChunk, make_chunk_id
+from maomao import vectorstore as vectorstore_module
+from maomao.vectorstore import VectorStore
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+
+@pytest.fixture
+def store(monkeypatch):
+    monkeypatch.setattr(vectorstore_module, "QdrantClient", lambda **_: QdrantClient(":memory:"))
+    store = VectorStore(QdrantConfig(collection_name="test"), embedding_dim=3)
+    store.client.create_collection(
+        "test", vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE)
+    )
+    yield store
+    store.client.close()
+
+
+def make_chunk(content: str, embedding) -> KnowledgeChunk:
+    return KnowledgeChunk(
+        id=make_chunk_id("local_doc", "a.md", content),
+        content=content,
+        source_type="local_doc",
+        source_path="/docs/a.md",
+        source_id="a.md",
+        metadata={"title": "A"},
+        location=ChunkLocation(start_line=1, end_line=2, char_start=0, char_end=len(content)),
+        embedding=embedding,
+    )
+
+
+class TestVectorStore:
+    def test_upserts_float32_rows_and_searches(self, store):
+        matrix = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype=np.float32)
+        chunks = [make_chunk("first", matrix[0]), make_chunk("second", matrix[1])]
+        chunks.append(make_chunk("pending", None))
+
+        store.upsert_chunks(chunks)
+
+        assert store.count() == 2
+        results = store.search(np.array([0.0, 1.0, 0.0], dtype=np.float32), limit=1)
+        assert results[0].chunk.content == "second"
+        assert results[0].chunk.location == chunks[1].location
+        assert results[0].chunk.metadata == {"title": "A"}
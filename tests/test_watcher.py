@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from maomao.sources import LocalDocSource
+from maomao.watcher import DocWatcher, _ChangeHandler
+from watchdog.events import DirModifiedEvent, FileModifiedEvent, FileMovedEvent
+
+
+@pytest.mark.asyncio
+class TestChangeHandler:
+    async def test_filters_and_forwards_events(self, tmp_path):
+        queue: asyncio.Queue = asyncio.Queue()
+        source = LocalDocSource(path=str(tmp_path))
+        handler = _ChangeHandler(asyncio.get_running_loop(), queue, 0, source)
+
+        handler.on_any_event(DirModifiedEvent(str(tmp_path / "docs")))
+        handler.on_any_event(FileModifiedEvent(str(tmp_path / "node_modules" / "a.md")))
+        handler.on_any_event(FileModifiedEvent(str(tmp_path / "a.md")))
+        handler.on_any_event(FileMovedEvent(str(tmp_path / "b.md"), str(tmp_path / "c.md")))
+        await asyncio.sleep(0)
+
+        assert queue.get_nowait() == (0, [str(tmp_path / "a.md")], False)
+        assert queue.get_nowait() == (0, [str(tmp_path / "b.md"), str(tmp_path / "c.md")], False)
+        assert queue.empty()
+
+
+@pytest.mark.asyncio
+class TestDocWatcher:
+    async def test_collect_coalesces_bursts(self):
+        watcher = DocWatcher(pipeline=None, debounce_seconds=0.05)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def burst():
+            for i in range(5):
+                queue.put_nowait((0, [f"/docs/{i % 2}.md"], False))
+                await asyncio.sleep(0.01)
+            queue.put_nowait((1, ["/other/dir"], True))
+
+        producer = asyncio.create_task(burst())
+        batch = await watcher._collect(queue)
+        await producer
+
+        assert batch == {0: ({"/docs/0.md", "/docs/1.md"}, False), 1: ({"/other/dir"}, True)}
+        assert queue.empty()
+
+    async def test_ingest_reads_the_watched_sources_state(self, tmp_path):
+        source = LocalDocSource(path=str(tmp_path))
+        requested = []
+
+        class Pipeline:
+            def source_state(self, knowledge_source):
+                requested.append(knowledge_source)
+                return {"files": {}}
+
+            async def ingest_changes(self, knowledge_source, changes):
+                raise AssertionError("path outside the source must not be ingested")
+
+        watcher = DocWatcher(pipeline=Pipeline(), debounce_seconds=0.05)
+        try:
+            await watcher._ingest(source, {str(tmp_path.parent / "elsewhere.md")}, False)
+        finally:
+            await source.close()
+
+        assert requested == [source]